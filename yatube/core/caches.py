@@ -0,0 +1,358 @@
+import hashlib
+import math
+import random
+import time
+from functools import wraps
+from urllib.parse import parse_qsl, urlsplit
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.cache import (
+    get_cache_key, learn_cache_key, patch_cache_control,
+    patch_response_headers,
+)
+
+
+BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'memcached': 'django.core.cache.backends.memcached.MemcachedCache',
+    'pylibmc': 'django.core.cache.backends.memcached.PyLibMCCache',
+    'redis': 'django_redis.cache.RedisCache',
+    'rediss': 'django_redis.cache.RedisCache',
+}
+MISSING = object()
+
+
+def cache_from_url(url):
+    """Настройки одного кеша Django по адресу.
+
+    locmem://name, file:///abs/path, memcached://host:port[,host:port],
+    pylibmc://host:port, redis://host:port/db (нужен django-redis).
+    Параметры timeout, key_prefix и max_entries задаются в query.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in BACKENDS:
+        raise ImproperlyConfigured(f'Неизвестная схема кеша: {url}')
+    config = {'BACKEND': BACKENDS[parts.scheme]}
+    if parts.scheme == 'locmem':
+        config['LOCATION'] = parts.netloc
+    elif parts.scheme == 'file':
+        config['LOCATION'] = parts.path
+    elif parts.scheme in ('redis', 'rediss'):
+        config['LOCATION'] = url.split('?')[0]
+    elif parts.netloc:
+        config['LOCATION'] = parts.netloc.split(',')
+    else:
+        config['LOCATION'] = f'unix:{parts.path}'
+    config.update(query_options(parts.query))
+    return config
+
+
+def query_options(query):
+    config, options = {}, {}
+    for name, value in parse_qsl(query):
+        if name == 'timeout':
+            config['TIMEOUT'] = None if value == 'none' else int(value)
+        elif name == 'key_prefix':
+            config['KEY_PREFIX'] = value
+        elif name == 'max_entries':
+            options['MAX_ENTRIES'] = int(value)
+        else:
+            options[name.upper()] = value
+    if options:
+        config['OPTIONS'] = options
+    return config
+
+
+def caches_from_env(environ):
+    """CACHES из переменных окружения.
+
+    CACHE_URL — общий кеш всех процессов. Если задан CACHE_L1_URL,
+    default становится TieredCache: локальный кеш процесса перед общим,
+    записи в нём живут не дольше CACHE_L1_TIMEOUT секунд.
+    """
+    shared = cache_from_url(environ.get('CACHE_URL', 'locmem://'))
+    l1_url = environ.get('CACHE_L1_URL')
+    if not l1_url:
+        return {'default': shared}
+    return {
+        'default': {
+            'BACKEND': 'core.caches.TieredCache',
+            'OPTIONS': {
+                'L1': 'local',
+                'L2': 'shared',
+                'L1_TIMEOUT': int(environ.get('CACHE_L1_TIMEOUT', 5)),
+            },
+        },
+        'local': cache_from_url(l1_url),
+        'shared': shared,
+    }
+
+
+def shared(backend):
+    """Общий для всех процессов уровень backend.
+
+    У TieredCache это L2: данные под блокировкой cache.add нужно
+    читать мимо L1, где может лежать устаревшая копия процесса.
+    """
+    if isinstance(backend, TieredCache):
+        return backend.l2
+    return backend
+
+
+class TieredCache(BaseCache):
+    """Двухуровневый кеш: L1 в памяти процесса перед общим L2.
+
+    Чтение сначала идёт в L1, промах дочитывается из L2 и кладётся
+    в L1 на L1_TIMEOUT секунд. Запись и удаление идут в оба уровня,
+    поэтому другие процессы видят изменения не позже чем через
+    L1_TIMEOUT. Префиксы и версии ключей задаются у самих уровней.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.l1_alias = options.get('L1', 'local')
+        self.l2_alias = options.get('L2', 'shared')
+        self.l1_timeout = options.get('L1_TIMEOUT', 5)
+
+    @property
+    def l1(self):
+        return caches[self.l1_alias]
+
+    @property
+    def l2(self):
+        return caches[self.l2_alias]
+
+    def l1_ttl(self, timeout=DEFAULT_TIMEOUT):
+        if timeout is DEFAULT_TIMEOUT or timeout is None:
+            return self.l1_timeout
+        return min(timeout, self.l1_timeout)
+
+    def get(self, key, default=None, version=None):
+        value = self.l1.get(key, MISSING, version=version)
+        if value is not MISSING:
+            return value
+        value = self.l2.get(key, MISSING, version=version)
+        if value is MISSING:
+            return default
+        self.l1.set(key, value, self.l1_timeout, version=version)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = self.l1.get_many(keys, version=version)
+        missing = [key for key in keys if key not in found]
+        if missing:
+            shared = self.l2.get_many(missing, version=version)
+            self.l1.set_many(shared, self.l1_timeout, version=version)
+            found.update(shared)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.l2.set(key, value, timeout, version=version)
+        self.l1.set(key, value, self.l1_ttl(timeout), version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.l2.set_many(data, timeout, version=version)
+        self.l1.set_many(data, self.l1_ttl(timeout), version=version)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.l2.add(key, value, timeout, version=version)
+        if added:
+            self.l1.set(key, value, self.l1_ttl(timeout), version=version)
+        else:
+            self.l1.delete(key, version=version)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self.l1.delete(key, version=version)
+        return self.l2.touch(key, timeout, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        value = self.l2.incr(key, delta, version=version)
+        self.l1.set(key, value, self.l1_timeout, version=version)
+        return value
+
+    def delete(self, key, version=None):
+        self.l1.delete(key, version=version)
+        return self.l2.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self.l1.delete_many(keys, version=version)
+        self.l2.delete_many(keys, version=version)
+
+    def clear(self):
+        self.l1.clear()
+        self.l2.clear()
+
+
+STATS_EVENTS = (
+    'hit', 'early', 'stale', 'refresh', 'miss', 'coalesced', 'lock_timeout',
+)
+LOCK_POLL = 0.05
+
+
+def stats_key(event):
+    return f'core:cache:stats:{event}'
+
+
+def record(event):
+    key = stats_key(event)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def cache_stats():
+    """Сколько раз cache_response попадал в каждую из веток."""
+    found = cache.get_many([stats_key(event) for event in STATS_EVENTS])
+    return {
+        event: found.get(stats_key(event), 0) for event in STATS_EVENTS
+    }
+
+
+def reset_cache_stats():
+    cache.delete_many([stats_key(event) for event in STATS_EVENTS])
+
+
+def lock_key(request, key_prefix):
+    url = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    return f'core:cache:lock:{key_prefix}:{url}'
+
+
+def personal(request):
+    """Ответ зависит от посетителя: он вошёл или у него есть сессия.
+
+    Такие страницы не кешируются целиком: SessionMiddleware добавляет
+    Vary: Cookie уже после view, и копия досталась бы всем.
+    """
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return True
+    session = getattr(request, 'session', None)
+    return session is not None and not session.is_empty()
+
+
+def expired(entry, beta):
+    """Вероятностное досрочное истечение (XFetch).
+
+    Чем дольше считалась страница и чем ближе срок, тем вероятнее,
+    что один из запросов пересчитает её заранее.
+    """
+    jitter = -entry['delta'] * beta * math.log(1 - random.random())
+    return time.time() + jitter >= entry['expires']
+
+
+class ResponseCache:
+    """Кеш ответов одного view с защитой от одновременного пересчёта.
+
+    Пересчитывает страницу только запрос, взявший блокировку; остальные
+    получают устаревшую копию, которая хранится ещё stale_timeout секунд
+    после timeout, а если копии нет — ждут её до lock_wait секунд.
+    Срок копии наступает случайно чуть раньше timeout, с силой beta.
+    Кешируются только ответы анонимным посетителям без сессии.
+
+    timeout действует только на сервере: браузерам и прокси отдаётся
+    max_age, по умолчанию 0 — страница каждый раз перепроверяется,
+    и старая лента не показывается после правки.
+    """
+
+    def __init__(self, view, timeout, key_prefix='', stale_timeout=0,
+                 beta=1.0, lock_timeout=10, lock_wait=2, max_age=0):
+        self.view = view
+        self.timeout = timeout
+        self.max_age = max_age
+        self.key_prefix = key_prefix
+        self.stale_timeout = stale_timeout
+        self.beta = beta
+        self.lock_timeout = lock_timeout
+        self.lock_wait = lock_wait
+
+    def __call__(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or personal(request):
+            return self.view(request, *args, **kwargs)
+        entry = self.lookup(request)
+        if entry is None:
+            return self.missed(request, *args, **kwargs)
+        if time.time() >= entry['expires']:
+            response = self.locked('refresh', request, *args, **kwargs)
+            if response is None:
+                record('stale')
+                return entry['response']
+            return response
+        if expired(entry, self.beta):
+            response = self.locked('early', request, *args, **kwargs)
+            if response is not None:
+                return response
+        record('hit')
+        return entry['response']
+
+    def lookup(self, request):
+        key = get_cache_key(request, self.key_prefix, 'GET', cache=cache)
+        return cache.get(key) if key else None
+
+    def missed(self, request, *args, **kwargs):
+        response = self.locked('miss', request, *args, **kwargs)
+        if response is not None:
+            return response
+        deadline = time.time() + self.lock_wait
+        while time.time() < deadline:
+            time.sleep(LOCK_POLL)
+            entry = self.lookup(request)
+            if entry is not None:
+                record('coalesced')
+                return entry['response']
+        record('lock_timeout')
+        return self.compute(request, *args, **kwargs)
+
+    def locked(self, event, request, *args, **kwargs):
+        """Пересчитывает страницу, если блокировка свободна, иначе None."""
+        lock = lock_key(request, self.key_prefix)
+        if not cache.add(lock, 1, self.lock_timeout):
+            return None
+        record(event)
+        try:
+            return self.compute(request, *args, **kwargs)
+        finally:
+            cache.delete(lock)
+
+    def compute(self, request, *args, **kwargs):
+        started = time.time()
+        response = self.view(request, *args, **kwargs)
+        if (
+            response.streaming or response.status_code != 200
+            or response.cookies
+        ):
+            return response
+        if hasattr(response, 'render') and callable(response.render):
+            response.render()
+        patch_response_headers(response, self.max_age)
+        if not self.max_age:
+            patch_cache_control(response, must_revalidate=True)
+        ttl = self.timeout + self.stale_timeout
+        key = learn_cache_key(
+            request, response, ttl, self.key_prefix, cache=cache
+        )
+        finished = time.time()
+        cache.set(key, {
+            'response': response,
+            'expires': finished + self.timeout,
+            'delta': finished - started,
+        }, ttl)
+        return response
+
+
+def cache_response(timeout, key_prefix='', **options):
+    """cache_page с защитой от наплыва запросов, см. ResponseCache.
+
+    Частоту каждого случая показывает cache_stats().
+    """
+    def decorator(view):
+        return wraps(view)(ResponseCache(view, timeout, key_prefix, **options))
+    return decorator
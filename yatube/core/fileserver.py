@@ -0,0 +1,154 @@
+import mimetypes
+import os
+import re
+from email.utils import formatdate
+
+from django.conf import settings
+
+
+# Хеш в имени: app.3f2a1b9c0d4e.css у статики, sha256 у картинок постов,
+# ключ sorl у миниатюр. Такие файлы под своим именем не меняются.
+HASHED = re.compile(r'[0-9a-f]{12,}\.\w+$')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'public, max-age=0, must-revalidate'
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+RANGE = re.compile(r'bytes=(\d*)-(\d*)$')
+BLOCK_SIZE = 64 * 1024
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def byte_range(header, size):
+    """Границы (start, end) одного диапазона из заголовка Range.
+
+    None — отдать файл целиком: заголовка нет, он непонятен или
+    диапазонов несколько.
+    """
+    match = RANGE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        start, end = max(size - int(last), 0), size - 1
+        if int(last) == 0:
+            raise RangeNotSatisfiable
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if end < start and start < size:
+            return None
+    if start >= size:
+        raise RangeNotSatisfiable
+    return start, end
+
+
+def read_range(path, start, length):
+    with open(path, 'rb') as file_:
+        file_.seek(start)
+        while length > 0:
+            block = file_.read(min(BLOCK_SIZE, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+
+
+class FileServer:
+    """WSGI-обёртка, отдающая статику и медиа с диска мимо Django.
+
+    routes — пары (префикс URL, каталог). Файлы с хешем в имени
+    кешируются навсегда (immutable), остальные перепроверяются по ETag.
+    Если рядом лежит .br или .gz и клиент их понимает, отдаётся сжатая
+    копия. Поддерживается один диапазон Range с If-Range. Всё, чего
+    нет на диске, уходит в обёрнутое приложение.
+    """
+
+    def __init__(self, application, routes):
+        self.application = application
+        self.routes = [
+            (prefix, os.path.realpath(root))
+            for prefix, root in routes if prefix and root
+        ]
+
+    @classmethod
+    def from_settings(cls, application):
+        return cls(application, [
+            (settings.STATIC_URL, settings.STATIC_ROOT),
+            (settings.MEDIA_URL, settings.MEDIA_ROOT),
+        ])
+
+    def __call__(self, environ, start_response):
+        if environ['REQUEST_METHOD'] in ('GET', 'HEAD'):
+            path = self.find(environ.get('PATH_INFO', ''))
+            if path is not None:
+                return self.serve(environ, start_response, path)
+        return self.application(environ, start_response)
+
+    def find(self, path_info):
+        url = path_info.encode('iso-8859-1').decode('utf-8', 'replace')
+        for prefix, root in self.routes:
+            if url.startswith(prefix):
+                path = os.path.realpath(os.path.join(root, url[len(prefix):]))
+                if path.startswith(root + os.sep) and os.path.isfile(path):
+                    return path
+        return None
+
+    def negotiate(self, environ, path):
+        """Сжатая копия под Accept-Encoding; диапазоны — только без сжатия."""
+        if 'HTTP_RANGE' in environ:
+            return None, path
+        accepted = environ.get('HTTP_ACCEPT_ENCODING', '')
+        for encoding, extension in ENCODINGS:
+            if encoding in accepted and os.path.isfile(path + extension):
+                return encoding, path + extension
+        return None, path
+
+    def serve(self, environ, start_response, path):
+        content_type, _ = mimetypes.guess_type(path)
+        immutable = HASHED.search(os.path.basename(path))
+        encoding, path = self.negotiate(environ, path)
+        stat = os.stat(path)
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        headers = [
+            ('Cache-Control', IMMUTABLE if immutable else REVALIDATE),
+            ('ETag', etag),
+            ('Last-Modified', formatdate(stat.st_mtime, usegmt=True)),
+            ('Accept-Ranges', 'bytes'),
+            ('Vary', 'Accept-Encoding'),
+        ]
+        if etag in environ.get('HTTP_IF_NONE_MATCH', ''):
+            start_response('304 Not Modified', headers)
+            return []
+        headers.append(
+            ('Content-Type', content_type or 'application/octet-stream')
+        )
+        if encoding:
+            headers.append(('Content-Encoding', encoding))
+        if environ.get('HTTP_IF_RANGE', etag) != etag:
+            environ = dict(environ, HTTP_RANGE='')
+        try:
+            bounds = byte_range(environ.get('HTTP_RANGE', ''), stat.st_size)
+        except RangeNotSatisfiable:
+            headers.append(('Content-Range', f'bytes */{stat.st_size}'))
+            start_response('416 Range Not Satisfiable', headers)
+            return []
+        return self.respond(environ, start_response, path, headers, bounds,
+                            stat.st_size)
+
+    def respond(self, environ, start_response, path, headers, bounds, size):
+        if bounds is None:
+            start, end, status = 0, size - 1, '200 OK'
+        else:
+            start, end = bounds
+            status = '206 Partial Content'
+            headers.append(('Content-Range', f'bytes {start}-{end}/{size}'))
+        length = end - start + 1
+        headers.append(('Content-Length', str(length)))
+        start_response(status, headers)
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            return []
+        if bounds is None and 'wsgi.file_wrapper' in environ:
+            return environ['wsgi.file_wrapper'](open(path, 'rb'), BLOCK_SIZE)
+        return read_range(path, start, length)
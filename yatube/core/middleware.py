@@ -0,0 +1,39 @@
+import time
+
+from django.conf import settings
+
+from .routers import state
+
+
+COOKIE = 'primary_until'
+
+
+class PrimaryStickinessMiddleware:
+    """Читать свои записи: после записи клиент читает с основной базы.
+
+    Запрос, который что-то записал, ставит cookie на
+    REPLICA_STICKY_TIMEOUT секунд; пока она действует, ReplicaRouter
+    не отправляет чтения этого клиента на реплику.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            until = float(request.COOKIES.get(COOKIE, 0))
+        except ValueError:
+            until = 0
+        state.pinned = until > time.time()
+        state.wrote = False
+        try:
+            response = self.get_response(request)
+        finally:
+            state.pinned = False
+        if state.wrote:
+            timeout = settings.REPLICA_STICKY_TIMEOUT
+            response.set_cookie(
+                COOKIE, str(time.time() + timeout), max_age=timeout,
+                httponly=True, samesite='Lax',
+            )
+        return response
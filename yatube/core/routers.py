@@ -0,0 +1,61 @@
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+REPLICA = 'replica'
+# Только эти приложения читаются с реплики: сессии и пользователи
+# всегда берутся с основной базы, чтобы вход не отставал от реплики.
+REPLICA_APPS = frozenset({'posts'})
+
+state = threading.local()
+
+
+def use_replica(view):
+    """Чтения view идут на реплику, если она настроена."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        state.replica = True
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            state.replica = False
+    return wrapper
+
+
+@contextmanager
+def read_primary():
+    """Внутри блока все чтения идут на основную базу, как после записи."""
+    pinned = getattr(state, 'pinned', False)
+    state.pinned = True
+    try:
+        yield
+    finally:
+        state.pinned = pinned
+
+
+class ReplicaRouter:
+    """Чтения из use_replica-view — на реплику, всё остальное — на default.
+
+    Пока state.pinned (пользователь недавно писал), реплика не
+    используется; state.wrote отмечает, что запрос что-то записал.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (
+            getattr(state, 'replica', False)
+            and not getattr(state, 'pinned', False)
+            and model._meta.app_label in REPLICA_APPS
+            and REPLICA in connections.databases
+        ):
+            return REPLICA
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
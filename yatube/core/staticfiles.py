@@ -0,0 +1,56 @@
+import gzip
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+COMPRESSIBLE = (
+    '.css', '.js', '.svg', '.txt', '.html', '.json', '.xml', '.map', '.ico',
+    '.eot', '.ttf', '.otf',
+)
+
+
+def encoders():
+    """Пары (расширение, функция сжатия); brotli — если он установлен."""
+    yield '.gz', lambda data: gzip.compress(data, 9, mtime=0)
+    if brotli is not None:
+        yield '.br', lambda data: brotli.compress(data, quality=11)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Статика с хешем в имени и готовыми .gz/.br рядом с файлами.
+
+    Сжатые копии пишутся при collectstatic, чтобы FileServer отдавал
+    их без сжатия на лету; копия сохраняется, только если она заметно
+    меньше исходника. Пока collectstatic не запускался и манифеста нет,
+    url() отдаёт исходные имена — так работают тесты и разработка.
+    """
+
+    def stored_name(self, name):
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in sorted(set(paths) | set(self.hashed_files.values())):
+            if name.lower().endswith(COMPRESSIBLE) and self.exists(name):
+                self.compress(name)
+
+    def compress(self, name):
+        with self.open(name) as source:
+            data = source.read()
+        for extension, encode in encoders():
+            compressed = encode(data)
+            target = name + extension
+            if self.exists(target):
+                self.delete(target)
+            if len(compressed) < len(data) * 0.95:
+                self._save(target, ContentFile(compressed))
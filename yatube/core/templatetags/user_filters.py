@@ -6,3 +6,15 @@ register = template.Library()
 @register.filter
 def addclass(field, css):
     return field.as_widget(attrs={'class': css})
+
+
+@register.filter
+def page_window(page, radius=2):
+    """Номера страниц вокруг текущей, не больше 2 * radius + 1.
+
+    Ссылки на все страницы длинной ленты раздули бы разметку.
+    """
+    last = page.paginator.num_pages
+    return range(
+        max(1, page.number - radius), min(last, page.number + radius) + 1
+    )
@@ -0,0 +1,309 @@
+import gzip
+import json
+import os
+import tempfile
+from wsgiref.util import setup_testing_defaults
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.sessions.backends.signed_cookies import SessionStore
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection
+from django.templatetags.static import static
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory, SimpleTestCase, TestCase, override_settings,
+)
+
+from .caches import (
+    TieredCache, cache_from_url, cache_response, caches_from_env,
+)
+from .databases import database_from_url, databases_from_env
+from .fileserver import IMMUTABLE, REVALIDATE, FileServer
+
+
+class CacheConfigTest(SimpleTestCase):
+    def test_cache_from_url(self):
+        """Адреса кешей превращаются в настройки Django."""
+        cases = {
+            'locmem://': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': '',
+            },
+            'file:///var/tmp/yatube?timeout=600': {
+                'BACKEND': (
+                    'django.core.cache.backends.filebased.FileBasedCache'
+                ),
+                'LOCATION': '/var/tmp/yatube',
+                'TIMEOUT': 600,
+            },
+            'memcached://10.0.0.1:11211,10.0.0.2:11211?key_prefix=y': {
+                'BACKEND': (
+                    'django.core.cache.backends.memcached.MemcachedCache'
+                ),
+                'LOCATION': ['10.0.0.1:11211', '10.0.0.2:11211'],
+                'KEY_PREFIX': 'y',
+            },
+            'redis://localhost:6379/1?max_entries=100': {
+                'BACKEND': 'django_redis.cache.RedisCache',
+                'LOCATION': 'redis://localhost:6379/1',
+                'OPTIONS': {'MAX_ENTRIES': 100},
+            },
+        }
+        for url, expected in cases.items():
+            with self.subTest(url=url):
+                self.assertEqual(cache_from_url(url), expected)
+
+    def test_unknown_scheme(self):
+        with self.assertRaises(ImproperlyConfigured):
+            cache_from_url('mongo://localhost')
+
+    def test_tiered_from_env(self):
+        """CACHE_L1_URL включает двухуровневый кеш."""
+        config = caches_from_env({
+            'CACHE_URL': 'file:///tmp/shared', 'CACHE_L1_URL': 'locmem://',
+        })
+        self.assertEqual(
+            config['default']['BACKEND'], 'core.caches.TieredCache'
+        )
+        self.assertEqual(config['shared']['LOCATION'], '/tmp/shared')
+
+
+class TieredCacheTest(SimpleTestCase):
+    """Два процесса с собственным L1 и общим файловым L2."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(CACHES={
+            'default': cache_from_url('locmem://default'),
+            'worker_a': cache_from_url('locmem://a'),
+            'worker_b': cache_from_url('locmem://b'),
+            'shared': cache_from_url(f'file://{directory.name}'),
+        })
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.worker_a = TieredCache('', {'OPTIONS': {'L1': 'worker_a'}})
+        self.worker_b = TieredCache('', {'OPTIONS': {'L1': 'worker_b'}})
+
+    def test_workers_share_l2(self):
+        """Запись одного процесса видна другому через L2."""
+        self.worker_a.set('key', 'value')
+        self.assertEqual(self.worker_b.get('key'), 'value')
+        self.assertEqual(caches['worker_b'].get('key'), 'value')
+        self.assertEqual(
+            self.worker_b.get_many(['key', 'other']), {'key': 'value'}
+        )
+
+    def test_l1_hit_skips_l2(self):
+        """Попадание в L1 не обращается к общему кешу."""
+        self.worker_a.set('key', 'value')
+        caches['shared'].clear()
+        self.assertEqual(self.worker_a.get('key'), 'value')
+        self.assertIsNone(self.worker_b.get('key'))
+
+    def test_incr_and_delete_go_to_l2(self):
+        """incr и delete меняют общий кеш."""
+        self.worker_a.set('counter', 1)
+        self.assertEqual(self.worker_b.incr('counter'), 2)
+        self.assertEqual(caches['shared'].get('counter'), 2)
+        self.worker_b.delete('counter')
+        self.assertIsNone(caches['shared'].get('counter'))
+        self.assertTrue(self.worker_b.add('counter', 5))
+        self.assertEqual(caches['shared'].get('counter'), 5)
+
+
+class ResponseCacheTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+        @cache_response(60, 'test')
+        def view(request):
+            self.calls += 1
+            return HttpResponse(f'{request.user}: {self.calls}')
+        self.view = view
+
+    def get(self, user=None, session=None):
+        request = RequestFactory().get('/page/')
+        request.user = user or AnonymousUser()
+        request.session = session or SessionStore()
+        return self.view(request).content
+
+    def test_anonymous_page_is_shared(self):
+        self.assertEqual(self.get(), self.get())
+        self.assertEqual(self.calls, 1)
+
+    def test_personal_pages_are_not_stored(self):
+        """Страница вошедшего или посетителя с сессией не попадает
+        в кеш и не отдаётся другим."""
+        session = SessionStore()
+        session['cart'] = 1
+        first = self.get(user=User(pk=1, username='fan'))
+        self.get(session=session)
+        self.assertEqual(self.calls, 2)
+        self.assertNotEqual(self.get(), first)
+        self.assertEqual(self.calls, 3)
+
+    def test_clients_revalidate(self):
+        """Срок кеша сервера не передаётся браузерам и прокси."""
+        request = RequestFactory().get('/page/')
+        request.user = AnonymousUser()
+        request.session = SessionStore()
+        for response in (self.view(request), self.view(request)):
+            self.assertEqual(
+                response['Cache-Control'], 'max-age=0, must-revalidate'
+            )
+
+
+class DatabaseConfigTest(SimpleTestCase):
+    def test_database_from_url(self):
+        """Адреса баз превращаются в настройки Django."""
+        cases = {
+            'sqlite:///db.sqlite3': {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': '/srv/db.sqlite3',
+            },
+            'sqlite:////var/lib/yatube.db?timeout=20': {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': '/var/lib/yatube.db',
+                'OPTIONS': {'timeout': 20},
+            },
+            'postgres://user:p%40ss@db:6432/yatube?pgbouncer=1'
+            '&conn_max_age=0': {
+                'ENGINE': 'django.db.backends.postgresql',
+                'NAME': 'yatube',
+                'USER': 'user',
+                'PASSWORD': 'p@ss',
+                'HOST': 'db',
+                'PORT': '6432',
+                'CONN_MAX_AGE': 0,
+                'DISABLE_SERVER_SIDE_CURSORS': True,
+            },
+        }
+        for url, expected in cases.items():
+            with self.subTest(url=url):
+                self.assertEqual(database_from_url(url, '/srv'), expected)
+
+    def test_persistent_connections_by_default(self):
+        config = databases_from_env({'DB_CONN_MAX_AGE': '300'}, '/srv')
+        self.assertEqual(config['default']['CONN_MAX_AGE'], 300)
+        self.assertEqual(config['default']['NAME'], '/srv/db.sqlite3')
+
+    def test_unknown_scheme(self):
+        with self.assertRaises(ImproperlyConfigured):
+            database_from_url('oracle://db/yatube')
+
+
+class SqlitePragmasTest(TestCase):
+    def test_pragmas_applied_on_connect(self):
+        """Новое соединение SQLite ждёт блокировку, а не падает."""
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+
+class FileServerTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+        self.write('app.0123456789ab.css', b'body { color: red; }' * 50)
+        self.write('app.0123456789ab.css.gz', gzip.compress(b'css'))
+        self.write('logo.png', bytes(range(256)))
+        self.server = FileServer(self.fallback, [('/static/', self.root)])
+
+    def write(self, name, content):
+        with open(os.path.join(self.root, name), 'wb') as file_:
+            file_.write(content)
+
+    def fallback(self, environ, start_response):
+        start_response('404 Not Found', [])
+        return [b'django']
+
+    def get(self, path, **headers):
+        environ = {'PATH_INFO': path}
+        environ.update(headers)
+        setup_testing_defaults(environ)
+        response = {}
+
+        def start_response(status, headers):
+            response['status'] = status
+            response['headers'] = dict(headers)
+        body = b''.join(self.server(environ, start_response))
+        return response['status'], response['headers'], body
+
+    def test_hashed_file_is_immutable_and_precompressed(self):
+        """Файл с хешем кешируется навсегда, gzip берётся готовый."""
+        status, headers, body = self.get(
+            '/static/app.0123456789ab.css', HTTP_ACCEPT_ENCODING='gzip, br'
+        )
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(headers['Cache-Control'], IMMUTABLE)
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertEqual(headers['Content-Type'], 'text/css')
+        self.assertEqual(gzip.decompress(body), b'css')
+
+    def test_etag_revalidation(self):
+        """Файл без хеша перепроверяется по ETag и отвечает 304."""
+        _, headers, _ = self.get('/static/logo.png')
+        self.assertEqual(headers['Cache-Control'], REVALIDATE)
+        status, _, body = self.get(
+            '/static/logo.png', HTTP_IF_NONE_MATCH=headers['ETag']
+        )
+        self.assertEqual((status, body), ('304 Not Modified', b''))
+
+    def test_ranges(self):
+        """Диапазоны байтов, включая суффиксные и недопустимые."""
+        cases = {
+            'bytes=10-19': ('206 Partial Content', bytes(range(10, 20))),
+            'bytes=250-': ('206 Partial Content', bytes(range(250, 256))),
+            'bytes=-3': ('206 Partial Content', bytes(range(253, 256))),
+            'bytes=0-1,5-6': ('200 OK', bytes(range(256))),
+            'bytes=300-': ('416 Range Not Satisfiable', b''),
+        }
+        for header, expected in cases.items():
+            with self.subTest(header=header):
+                status, _, body = self.get(
+                    '/static/logo.png', HTTP_RANGE=header
+                )
+                self.assertEqual((status, body), expected)
+
+    def test_stale_if_range_sends_whole_file(self):
+        status, _, body = self.get(
+            '/static/logo.png', HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"old"'
+        )
+        self.assertEqual((status, len(body)), ('200 OK', 256))
+
+    def test_unknown_and_outside_paths_fall_through(self):
+        """Чужие и выходящие за каталог пути уходят в Django."""
+        for path in ('/static/missing.css', '/static/../etc/passwd', '/'):
+            with self.subTest(path=path):
+                self.assertEqual(self.get(path)[2], b'django')
+
+
+class CompressedStaticStorageTest(SimpleTestCase):
+    def test_collectstatic_writes_manifest_and_gzip(self):
+        """collectstatic даёт имена с хешем и сжатые копии рядом."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        with override_settings(
+            STATIC_ROOT=directory.name,
+            INSTALLED_APPS=['django.contrib.staticfiles'],
+        ):
+            call_command(
+                'collectstatic', interactive=False, verbosity=0
+            )
+            url = static('css/bootstrap.min.css')
+        with open(os.path.join(directory.name, 'staticfiles.json')) as file_:
+            hashed = json.load(file_)['paths']['css/bootstrap.min.css']
+        self.assertEqual(url, '/static/' + hashed)
+        self.assertTrue(
+            os.path.exists(os.path.join(directory.name, hashed + '.gz'))
+        )
+        self.assertFalse(
+            os.path.exists(os.path.join(directory.name, 'img/logo.png.gz'))
+        )
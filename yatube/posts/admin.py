@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Post, Group, Comment, Follow
+from . import search
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -15,6 +16,12 @@ class PostAdmin(admin.ModelAdmin):
     list_editable = ('group',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск по индексу вместо LIKE по всей таблице."""
+        if not search_term:
+            return queryset, False
+        return queryset.filter(pk__in=search.ranked_ids(search_term)), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = (
@@ -0,0 +1,177 @@
+"""Разбор русского текста для поиска: слова, стоп-слова и основы.
+
+Стеммер — алгоритм Snowball для русского языка
+(https://snowballstem.org/algorithms/russian/stemmer.html).
+"""
+import re
+from functools import lru_cache
+
+from django.db import models
+
+
+WORD = re.compile(r'\w+')
+VOWELS = 'аеиоуыэюя'
+MAX_TOKEN_LENGTH = 64
+
+# Стоп-слова Snowball: служебные слова не ищутся и не хранятся.
+STOP_WORDS = frozenset('''
+    и в во не что он на я с со как а то все она так его но да ты к у же
+    вы за бы по только ее мне было вот от меня еще нет о из ему теперь
+    когда даже ну вдруг ли если уже или ни быть был него до вас нибудь
+    опять уж вам ведь там потом себя ничего ей может они тут где есть
+    надо ней для мы тебя их чем была сам чтоб без будто чего раз тоже
+    себе под будет ж тогда кто этот того потому этого какой совсем ним
+    здесь этом один почти мой тем чтобы нее сейчас были куда зачем всех
+    никогда можно при наконец два об другой хоть после над больше тот
+    через эти нас про всего них какая много разве три эту моя впрочем
+    хорошо свою этой перед иногда лучше чуть том нельзя такой им более
+    всегда конечно всю между
+'''.split())
+
+
+def endings(*groups):
+    """Окончания по убыванию длины: (окончание, нужно ли «а»/«я» перед ним).
+
+    Каждая группа — пара (после «а»/«я», без условия).
+    """
+    table = {}
+    for after_a, plain in groups:
+        table.update({ending: True for ending in after_a.split()})
+        table.update({ending: False for ending in plain.split()})
+    return sorted(table.items(), key=lambda item: -len(item[0]))
+
+
+PERFECTIVE_GERUND = endings(
+    ('в вши вшись', 'ив ивши ившись ыв ывши ывшись'),
+)
+ADJECTIVE = endings((
+    '', 'ее ие ые ое ими ыми ей ий ый ой ем им ым ом его ого ему ому их '
+    'ых ую юю ая яя ою ею'
+),)
+PARTICIPLE = endings(('ем нн вш ющ щ', 'ивш ывш ующ'))
+REFLEXIVE = endings(('', 'ся сь'))
+VERB = endings((
+    'ла на ете йте ли й л ем н ло но ет ют ны ть ешь нно',
+    'ила ыла ена ейте уйте ите или ыли ей уй ил ыл им ым ен ило ыло ено '
+    'ят ует уют ит ыт ены ить ыть ишь ую ю'
+),)
+NOUN = endings((
+    '', 'а ев ов ие ье е иями ями ами еи ии и ией ей ой ий й иям ям ием ем '
+    'ам ом о у ах иях ях ы ь ию ью ю ия ья я'
+),)
+DERIVATIONAL = ('ость', 'ост')
+SUPERLATIVE = ('ейше', 'ейш')
+
+
+def remove_ending(rv, table):
+    """RV без самого длинного окончания из таблицы или None.
+
+    Как в Snowball, берётся самое длинное совпадение; если его условие
+    не выполнено, более короткие не пробуются.
+    """
+    for ending, after_a in table:
+        if rv.endswith(ending):
+            if after_a and rv[:-len(ending)][-1:] not in ('а', 'я'):
+                return None
+            return rv[:-len(ending)]
+    return None
+
+
+def regions(word):
+    """Начала областей RV и R2 в слове."""
+    rv = next(
+        (i + 1 for i, char in enumerate(word) if char in VOWELS), len(word)
+    )
+    r1 = r2 = len(word)
+    for i in range(1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            r1 = i + 1
+            break
+    for i in range(r1 + 1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            r2 = i + 1
+            break
+    return rv, r2
+
+
+def strip_inflection(rv):
+    """Шаг 1: деепричастие или возвратность и окончание формы."""
+    stripped = remove_ending(rv, PERFECTIVE_GERUND)
+    if stripped is not None:
+        return stripped
+    reflexive = remove_ending(rv, REFLEXIVE)
+    if reflexive is not None:
+        rv = reflexive
+    stripped = remove_ending(rv, ADJECTIVE)
+    if stripped is not None:
+        participle = remove_ending(stripped, PARTICIPLE)
+        return stripped if participle is None else participle
+    for table in (VERB, NOUN):
+        stripped = remove_ending(rv, table)
+        if stripped is not None:
+            return stripped
+    return rv
+
+
+def tidy_up(rv):
+    """Шаг 4: превосходная степень, двойное «н» и мягкий знак."""
+    for ending in SUPERLATIVE:
+        if rv.endswith(ending):
+            rv = rv[:-len(ending)]
+            return rv[:-1] if rv.endswith('нн') else rv
+    if rv.endswith('нн') or rv.endswith('ь'):
+        return rv[:-1]
+    return rv
+
+
+# Словарь текстов невелик и повторяется: при массовой загрузке основы
+# берутся из кеша, а не считаются заново для каждого вхождения.
+@lru_cache(maxsize=2 ** 16)
+def stem(word):
+    """Основа слова; слова без русских гласных не меняются."""
+    rv, r2 = regions(word)
+    head, tail = word[:rv], strip_inflection(word[rv:])
+    if tail.endswith('и'):
+        tail = tail[:-1]
+    for ending in DERIVATIONAL:
+        if tail.endswith(ending):
+            if len(head) + len(tail) - len(ending) >= r2:
+                tail = tail[:-len(ending)]
+            break
+    return head + tidy_up(tail)
+
+
+def analyze(text):
+    """Основы слов текста: нижний регистр, «ё» как «е», без стоп-слов.
+
+    Одинаково разбираются и сохраняемые тексты, и поисковые запросы.
+    """
+    words = WORD.findall(text.casefold().replace('ё', 'е'))
+    return [
+        stem(word)[:MAX_TOKEN_LENGTH]
+        for word in words if word not in STOP_WORDS
+    ]
+
+
+class SearchTokensField(models.TextField):
+    """Основы слов поля source через пробел, для поискового индекса.
+
+    Пересчитываются в pre_save, поэтому заполняются и при bulk_create.
+    """
+
+    def __init__(self, *args, source=None, **kwargs):
+        self.source = source
+        kwargs.setdefault('editable', False)
+        kwargs.setdefault('blank', True)
+        kwargs.setdefault('default', '')
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs['source'] = self.source
+        return name, path, args, kwargs
+
+    def pre_save(self, model_instance, add):
+        value = ' '.join(analyze(getattr(model_instance, self.source)))
+        setattr(model_instance, self.attname, value)
+        return value
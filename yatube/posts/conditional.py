@@ -0,0 +1,78 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.views.decorators.http import condition
+
+from . import feeds
+from .models import Post
+
+
+def versions(names):
+    return [feeds.get_version(feed, pk) for feed, pk in names]
+
+
+def by_version(names, compute):
+    """Значение, посчитанное для текущих версий лент и закешированное.
+
+    Любая правка меняет версию, поэтому такое значение не устаревает,
+    а повторные запросы обходятся без базы.
+    """
+    key = 'posts:modified:' + hashlib.md5(
+        ':'.join(versions(names)).encode()
+    ).hexdigest()
+    return cache.get_or_set(key, compute, settings.POSTS_FEED_TIMEOUT)
+
+
+def feed_etag(request, *names):
+    """ETag страницы: версии её лент и тот, кто смотрит.
+
+    Версии меняются при любой правке постов, комментариев, групп и
+    подписок, а разметка зависит от пользователя, поэтому его id
+    тоже входит в тег. Запросов к базе не нужно.
+    """
+    parts = versions(names)
+    parts.append(str(request.user.pk or 0))
+    return hashlib.md5(':'.join(parts).encode()).hexdigest()
+
+
+def feed_condition(feed, kwarg):
+    """condition() для ленты группы или автора.
+
+    Только ETag: дата правки постов не меняется при удалении постов,
+    подписках и входе на сайт, и Last-Modified отдавал бы старую
+    страницу клиентам с одним If-Modified-Since.
+    """
+    def etag(request, **kwargs):
+        return feed_etag(request, (feed, kwargs[kwarg]))
+
+    return condition(etag)
+
+
+def post_author(post_id):
+    """Имя автора поста, одним запросом на версию поста."""
+    posts = Post.objects.filter(pk=post_id)
+    return by_version([(feeds.POST, post_id)], lambda: posts.values_list(
+        'author__username', flat=True
+    ).first())
+
+
+def post_etag(request, post_id):
+    """ETag поста; у вошедших в него входит и CSRF-токен.
+
+    В форме комментария есть токен, а вход на сайт меняет его, не
+    трогая версий: со старым тегом браузер отправил бы форму со
+    старым токеном.
+    """
+    author = post_author(post_id)
+    if author is None:
+        return None
+    etag = feed_etag(request, (feeds.POST, post_id), (feeds.AUTHOR, author))
+    if not request.user.is_authenticated:
+        return etag
+    token = request.META.get('CSRF_COOKIE', '')
+    return hashlib.md5(f'{etag}:{token}'.encode()).hexdigest()
+
+
+# Только ETag, как у лент: см. feed_condition.
+post_condition = condition(post_etag)
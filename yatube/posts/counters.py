@@ -0,0 +1,84 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import F
+
+from .feeds import ALL, AUTHOR, FOLLOW, GROUP, feed_name
+from .models import AuthorCounter, Post
+
+
+def count_key(feed, pk=None):
+    """Ключ кеша, под которым хранится число постов ленты."""
+    return f'posts:count:{feed_name(feed, pk)}'
+
+
+def get_count(key, queryset):
+    """Число постов ленты из кеша; при промахе считается один раз."""
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, settings.POSTS_COUNT_TIMEOUT)
+    return count
+
+
+def change_count(keys, delta):
+    """Сдвигает счётчики лент, которые уже есть в кеше."""
+    for key in keys:
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            pass
+
+
+def forget_count(keys):
+    cache.delete_many(list(keys))
+
+
+def post_feed_keys(post, follower_ids=()):
+    """Ключи всех лент, в которые попадает пост."""
+    keys = [count_key(ALL), count_key(AUTHOR, post.author_id)]
+    if post.group_id is not None:
+        keys.append(count_key(GROUP, post.group_id))
+    keys.extend(count_key(FOLLOW, user_id) for user_id in follower_ids)
+    return keys
+
+
+def primary_posts_count(author_id):
+    """Число постов автора на основной базе, а не на реплике."""
+    return Post.objects.using(DEFAULT_DB_ALIAS).filter(
+        author_id=author_id
+    ).count()
+
+
+def author_posts_count(author):
+    """Число постов автора из сохранённого счётчика.
+
+    Счётчики заполняет миграция; недостающий считается на основной
+    базе, чтобы отставание реплики не записалось в него навсегда.
+    """
+    try:
+        return author.post_counter.posts_count
+    except AuthorCounter.DoesNotExist:
+        counter, _ = AuthorCounter.objects.get_or_create(
+            author_id=author.pk,
+            defaults={'posts_count': primary_posts_count(author.pk)},
+        )
+        return counter.posts_count
+
+
+def shift_author_count(author_id, delta):
+    """Сдвигает сохранённый счётчик, а для нового поста создаёт его.
+
+    Созданный счётчик уже учитывает пост: сигнал приходит после
+    записи. При удалении недостающий счётчик не создаётся — автор
+    может удаляться вместе с постами.
+    """
+    counters = AuthorCounter.objects.filter(author_id=author_id)
+    if counters.update(posts_count=F('posts_count') + delta) or delta < 0:
+        return
+    _, created = AuthorCounter.objects.get_or_create(
+        author_id=author_id,
+        defaults={'posts_count': primary_posts_count(author_id)},
+    )
+    if not created:
+        counters.update(posts_count=F('posts_count') + delta)
@@ -0,0 +1,147 @@
+"""Потоковые выгрузка и загрузка данных в NDJSON.
+
+Записи в формате сериализатора Django, по одной на строку:
+{"model": "posts.post", "pk": 1, "fields": {...}}.
+"""
+import gzip
+import json
+import sys
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+
+from django.apps import apps
+from django.core.management.color import no_style
+from django.db import connection, models
+from django.utils import timezone
+
+from .analysis import SearchTokensField
+
+
+# Что выгружается и загружается, в порядке зависимостей.
+MODELS = (
+    'auth.user', 'posts.group', 'posts.post', 'posts.comment', 'posts.follow',
+)
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = ' \t\r\n,'
+
+
+def dump_models():
+    return [apps.get_model(label) for label in MODELS]
+
+
+def exported_fields(model):
+    """Поля для выгрузки: без связей многие-ко-многим и без основ слов,
+    которые пересчитываются при загрузке."""
+    return [
+        field.name for field in model._meta.local_fields
+        if not field.primary_key
+        and not isinstance(field, SearchTokensField)
+    ]
+
+
+def open_dump(path, mode):
+    """Файл дампа: «-» — stdin/stdout, *.gz читается и пишется сжатым."""
+    if path == '-':
+        return nullcontext(sys.stdin if 'r' in mode else sys.stdout)
+    if path.endswith('.gz'):
+        return gzip.open(path, mode, encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def iter_records(file_, chunk_size=CHUNK_SIZE):
+    """Записи из NDJSON или из JSON-массива dumpdata.
+
+    Файл читается кусками по chunk_size символов, в памяти держится
+    только текущая запись.
+    """
+    first = file_.read(1)
+    while first and first.isspace():
+        first = file_.read(1)
+    if first == '[':
+        yield from iter_array(file_, chunk_size)
+    elif first:
+        yield json.loads(first + file_.readline())
+        for line in file_:
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_array(file_, chunk_size):
+    decoder = json.JSONDecoder()
+    buffer, position = '', 0
+    while True:
+        while position < len(buffer) and buffer[position] in WHITESPACE:
+            position += 1
+        if position < len(buffer) and buffer[position] == ']':
+            return
+        try:
+            record, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            chunk = file_.read(chunk_size)
+            if not chunk:
+                raise
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        yield record
+
+
+def batched(items, size):
+    """Списки по size элементов из итератора items."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+@contextmanager
+def dump_dates(*dump_models):
+    """auto_now и auto_now_add не затирают даты из дампа.
+
+    Флаги полей снимаются на время загрузки. Отдаёт функцию, которая
+    заполняет пустые даты объектов: создания — текущим временем,
+    изменения — датой создания.
+    """
+    fields = [
+        field for model in dump_models for field in model._meta.fields
+        if isinstance(field, models.DateField)
+        and (field.auto_now or field.auto_now_add)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    created = defaultdict(list)
+    changed = defaultdict(list)
+    for field in fields:
+        dates = created if field.auto_now_add else changed
+        dates[field.model].append(field.attname)
+        field.auto_now = field.auto_now_add = False
+
+    def fill_dates(objects):
+        now = timezone.now()
+        for obj in objects:
+            model = obj._meta.concrete_model
+            for attname in created[model]:
+                if getattr(obj, attname) is None:
+                    setattr(obj, attname, now)
+            default = (
+                getattr(obj, created[model][0]) if created[model] else now
+            )
+            for attname in changed[model]:
+                if getattr(obj, attname) is None:
+                    setattr(obj, attname, default)
+
+    try:
+        yield fill_dates
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def reset_sequences(dump_models):
+    """Счётчики первичных ключей после вставки с явными id."""
+    statements = connection.ops.sequence_reset_sql(no_style(), dump_models)
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
@@ -0,0 +1,123 @@
+import hashlib
+import re
+import time
+import uuid
+from contextlib import nullcontext
+from functools import wraps
+
+from core.caches import cache_response
+from core.routers import read_primary
+from django.conf import settings
+from django.core.cache import cache
+
+
+ALL = 'all'
+GROUP = 'group'
+AUTHOR = 'author'
+FOLLOW = 'follow'
+POST = 'post'
+
+SAFE_PK = re.compile(r'[\w.@+-]{1,64}', re.ASCII)
+
+
+def feed_name(feed, pk=None):
+    """Имя ленты для ключей кеша: общая, группы, автора или подписок.
+
+    Имена пользователей и адреса групп вне ASCII или длинные
+    заменяются хешем: memcached не принимает такие ключи.
+    """
+    if pk is None:
+        return feed
+    pk = str(pk)
+    if not SAFE_PK.fullmatch(pk):
+        pk = hashlib.md5(pk.encode()).hexdigest()
+    return f'{feed}:{pk}'
+
+
+def version_key(name):
+    return f'posts:version:{name}'
+
+
+def new_version():
+    """Версия с временем выдачи: по нему видно, догнала ли реплика."""
+    return f'{int(time.time())}-{uuid.uuid4().hex}'
+
+
+def settled(version):
+    """Прошло ли с выдачи версии REPLICA_STICKY_TIMEOUT секунд.
+
+    До этого реплика может ещё не видеть правку, сменившую версию.
+    """
+    issued, sep, _ = version.partition('-')
+    # Версии без времени выданы давно, до того, как его стали писать.
+    if not sep:
+        return True
+    return int(issued) + settings.REPLICA_STICKY_TIMEOUT <= time.time()
+
+
+def get_version(feed, pk=None):
+    """Текущая версия ленты; меняется при любом изменении её постов.
+
+    Версии групп и авторов ведутся по slug и username, как в адресах
+    страниц, подписок — по id подписчика, поста — по id поста.
+    """
+    key = version_key(feed_name(feed, pk))
+    version = cache.get(key)
+    if version is None:
+        version = new_version()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump(names):
+    """Выдаёт лентам новые версии, кеш по старым версиям устаревает."""
+    cache.set_many(
+        {version_key(name): new_version() for name in set(names)}, None
+    )
+
+
+def read_settled(feed, pk=None, version=None):
+    """Контекст для сборки ленты, которая пойдёт в кеш под версией.
+
+    Пока версия не settled(), чтения идут на основную базу: страницы,
+    списки id и счётчики, собранные по отстающей реплике, пролежали бы
+    в кеше под новой версией до конца своего срока.
+    """
+    if version is None:
+        version = get_version(feed, pk)
+    return nullcontext() if settled(version) else read_primary()
+
+
+def page_key(feed, pk=None):
+    """Префикс ключей кеша со списками id постов на страницах ленты."""
+    return f'posts:page:{feed_name(feed, pk)}:{get_version(feed, pk)}'
+
+
+def cache_feed(timeout, feed, kwarg=None):
+    """cache_response, ключ которого включает версию ленты.
+
+    kwarg — имя аргумента view, по которому определяется лента
+    (slug группы или username автора). Страницы вошедших пользователей
+    не кешируются целиком (в них подписка и шапка с именем): им
+    достаются кеш фрагментов постов и списки id страниц.
+
+    Свежая версия собирается с основной базы, см. read_settled().
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            pk = kwargs.get(kwarg) if kwarg else None
+            version = get_version(feed, pk)
+            prefix = f'{feed_name(feed, pk)}:{version}'
+            cached_view = cache_response(
+                timeout, prefix,
+                stale_timeout=settings.POSTS_FEED_STALE_TIMEOUT,
+                beta=settings.POSTS_FEED_EARLY_BETA,
+                lock_timeout=settings.POSTS_FEED_LOCK_TIMEOUT,
+                lock_wait=settings.POSTS_FEED_LOCK_WAIT,
+            )(view)
+            with read_settled(feed, pk, version):
+                return cached_view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -1,5 +1,8 @@
 from .models import Post, Group, Comment
 from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.template.defaultfilters import filesizeformat
 
 
 class PostForm(forms.ModelForm):
@@ -14,6 +17,23 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ['text', 'group', 'image']
 
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        if not isinstance(image, UploadedFile):
+            return image
+        if image.size > settings.POSTS_IMAGE_MAX_UPLOAD_SIZE:
+            raise forms.ValidationError(
+                'Файл больше %s.' % filesizeformat(
+                    settings.POSTS_IMAGE_MAX_UPLOAD_SIZE
+                )
+            )
+        width, height = image.image.size
+        if width * height > settings.POSTS_IMAGE_MAX_PIXELS:
+            raise forms.ValidationError(
+                'Картинка слишком большая: %s×%s точек.' % (width, height)
+            )
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
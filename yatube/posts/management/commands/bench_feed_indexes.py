@@ -0,0 +1,135 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from posts.models import Comment, Follow, Group, Post
+
+
+User = get_user_model()
+
+# Индексы внешних ключей, которые были до составных индексов лент.
+BEFORE = [
+    (Post, models.Index(fields=['group'], name='bench_post_group_idx')),
+    (Post, models.Index(fields=['author'], name='bench_post_author_idx')),
+    (Comment, models.Index(fields=['post'], name='bench_comment_post_idx')),
+]
+AFTER = [
+    (model, index)
+    for model in (Post, Comment) for index in model._meta.indexes
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает синтетические посты и сравнивает планы (EXPLAIN) '
+        'и время запросов лент со старыми и новыми индексами. '
+        'Данные и индексы откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--authors', type=int, default=200)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--comments', type=int, default=200)
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            queries = self.load(rng, options)
+            self.swap(AFTER, BEFORE)
+            self.run('до', queries, options['repeat'])
+            self.swap(BEFORE, AFTER)
+            self.run('после', queries, options['repeat'])
+            transaction.set_rollback(True)
+
+    def load(self, rng, options):
+        prefix = f'bench{rng.randrange(10 ** 9)}_'
+        User.objects.bulk_create([
+            User(username=f'{prefix}{i}') for i in range(options['authors'])
+        ])
+        authors = list(User.objects.filter(
+            username__startswith=prefix
+        ).values_list('pk', flat=True))
+        Group.objects.bulk_create([
+            Group(title=f'{prefix}{i}', slug=f'{prefix}{i}', description='')
+            for i in range(options['groups'])
+        ])
+        groups = list(Group.objects.filter(
+            slug__startswith=prefix
+        ).values_list('pk', flat=True))
+        now = timezone.now()
+        posts = [
+            Post(
+                text=f'Пост {i}', author_id=rng.choice(authors),
+                group_id=rng.choice(groups + [None]),
+                pub_date=now - timedelta(minutes=rng.randrange(10 ** 6)),
+            )
+            for i in range(options['posts'])
+        ]
+        pub_date = Post._meta.get_field('pub_date')
+        pub_date.auto_now_add = False
+        try:
+            Post.objects.bulk_create(posts)
+        finally:
+            pub_date.auto_now_add = True
+        post = Post.objects.filter(author_id__in=authors).first()
+        Comment.objects.bulk_create([
+            Comment(post=post, author_id=rng.choice(authors), text='Текст')
+            for _ in range(options['comments'])
+        ])
+        reader = authors[0]
+        Follow.objects.bulk_create([
+            Follow(user_id=reader, author_id=author_id)
+            for author_id in rng.sample(authors[1:], min(20, len(authors) - 1))
+        ])
+        self.stdout.write(
+            f'Загружено: {len(posts)} постов, {len(authors)} авторов, '
+            f'{len(groups)} групп, {options["comments"]} комментариев'
+        )
+        feed = Post.objects.for_feed().order_by('-pub_date', '-pk')
+        middle = feed.filter(group_id=groups[0])[options['posts'] // 100]
+        return {
+            'главная': feed[:10],
+            'группа': feed.filter(group_id=groups[0])[:10],
+            'группа, курсор': feed.filter(
+                models.Q(pub_date__lt=middle.pub_date)
+                | models.Q(pub_date=middle.pub_date, pk__lt=middle.pk),
+                group_id=groups[0],
+            )[:10],
+            'профиль': feed.filter(author_id=authors[1])[:10],
+            'подписки': feed.filter(author__following__user_id=reader)[:10],
+            'комментарии': Comment.objects.for_thread().filter(post=post),
+        }
+
+    def swap(self, old, new):
+        editor = connection.schema_editor()
+        with connection.cursor() as cursor:
+            for model, index in old:
+                cursor.execute(str(index.remove_sql(model, editor)))
+            for model, index in new:
+                cursor.execute(str(index.create_sql(model, editor)))
+            if connection.vendor == 'sqlite':
+                cursor.execute('ANALYZE')
+
+    def run(self, phase, queries, repeat):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'Индексы {phase}:'))
+        for name, queryset in queries.items():
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(
+                f'  {name}: p50 {statistics.median(timings):.2f} мс, '
+                f'max {max(timings):.2f} мс'
+            )
+            for line in queryset.explain().splitlines():
+                self.stdout.write(f'      {line}')
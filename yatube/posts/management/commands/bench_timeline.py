@@ -0,0 +1,146 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+
+from posts import counters, timeline
+from posts.models import Follow, Post
+from posts.timeline import TimelinePaginator
+
+
+User = get_user_model()
+
+# Свой кеш без вытеснения: в LocMemCache по умолчанию 300 записей,
+# и прогретые ленты вытеснялись бы раньше, чем до них дойдёт рассылка.
+BENCH_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'bench_timeline',
+        'OPTIONS': {'MAX_ENTRIES': 10 ** 9},
+    },
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает рассылку лент подписок (push) и гибридный режим '
+        'на синтетическом графе подписок. Данные откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--followers', type=int, default=5000)
+        parser.add_argument('--authors', type=int, default=50)
+        parser.add_argument('--posts-per-author', type=int, default=20)
+        parser.add_argument('--threshold', type=int, default=1000)
+        parser.add_argument('--readers', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with override_settings(CACHES=BENCH_CACHES), transaction.atomic():
+            authors, followers = self.make_graph(rng, options)
+            readers = rng.sample(
+                followers, min(options['readers'], len(followers))
+            )
+            for mode, threshold in (
+                ('push', None), ('hybrid', options['threshold'])
+            ):
+                with override_settings(
+                    POSTS_TIMELINE_ENABLED=True,
+                    POSTS_TIMELINE_FANOUT_THRESHOLD=threshold,
+                ):
+                    self.run_mode(mode, authors, followers, readers)
+            transaction.set_rollback(True)
+
+    def make_graph(self, rng, options):
+        """Авторы со степенным распределением числа подписчиков."""
+        prefix = f'bench{rng.randrange(10 ** 9)}_'
+        User.objects.bulk_create([
+            User(username=f'{prefix}a{i}') for i in range(options['authors'])
+        ] + [
+            User(username=f'{prefix}f{i}')
+            for i in range(options['followers'])
+        ])
+        authors = list(User.objects.filter(
+            username__startswith=f'{prefix}a'
+        ).order_by('pk').values_list('pk', flat=True))
+        followers = list(User.objects.filter(
+            username__startswith=f'{prefix}f'
+        ).values_list('pk', flat=True))
+        follows = []
+        for rank, author_id in enumerate(authors, start=1):
+            size = max(1, len(followers) // rank)
+            follows.extend(
+                Follow(user_id=user_id, author_id=author_id)
+                for user_id in rng.sample(followers, size)
+            )
+        Follow.objects.bulk_create(follows)
+        Post.objects.bulk_create([
+            Post(text=f'Пост {i}', author_id=author_id)
+            for author_id in authors
+            for i in range(options['posts_per_author'])
+        ])
+        self.stdout.write(
+            f'Граф: {len(authors)} авторов, {len(followers)} подписчиков, '
+            f'{len(follows)} подписок'
+        )
+        return authors, followers
+
+    def run_mode(self, mode, authors, followers, readers):
+        cache.delete_many(
+            [timeline.CELEBRITIES_KEY]
+            + [timeline.timeline_key(user_id) for user_id in followers]
+        )
+        for user_id in followers:
+            timeline.get_timeline(user_id)
+        for author_id in (authors[0], authors[-1]):
+            user_ids = list(Follow.objects.filter(
+                author_id=author_id
+            ).values_list('user_id', flat=True))
+            self.check_warm(user_ids)
+            with override_settings(POSTS_TIMELINE_ENABLED=False):
+                post = Post.objects.create(
+                    text='Новый пост', author_id=author_id
+                )
+            fanout = 0
+            if author_id not in timeline.celebrity_ids():
+                fanout = len(user_ids)
+            started = time.perf_counter()
+            written = timeline.distribute(post, user_ids)
+            elapsed = (time.perf_counter() - started) * 1000
+            self.stdout.write(
+                f'[{mode}] запись: автор с {len(user_ids)} подписчиками, '
+                f'рассылка в {fanout} лент, перезаписано {written}, '
+                f'{elapsed:.1f} мс'
+            )
+        timings = []
+        for user_id in readers:
+            started = time.perf_counter()
+            paginator = TimelinePaginator(
+                Post.objects.filter(author__following__user_id=user_id),
+                10, timeline.get_timeline(user_id),
+                count_key=counters.count_key(counters.FOLLOW, user_id)
+            )
+            list(paginator.page(1))
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        self.stdout.write(
+            f'[{mode}] чтение первой страницы: '
+            f'p50 {statistics.median(timings):.2f} мс, '
+            f'p95 {timings[int(len(timings) * 0.95) - 1]:.2f} мс'
+        )
+
+    def check_warm(self, user_ids):
+        """Все ленты подписчиков в кеше, иначе замер рассылки неверен."""
+        keys = [timeline.timeline_key(user_id) for user_id in user_ids]
+        missing = len(keys) - len(cache.get_many(keys))
+        if missing:
+            raise CommandError(
+                f'В кеше нет {missing} из {len(keys)} прогретых лент: '
+                'рассылка записала бы меньше, чем должна.'
+            )
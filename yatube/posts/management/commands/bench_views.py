@@ -0,0 +1,289 @@
+import io
+import json
+import math
+import statistics
+import subprocess
+import time
+from contextlib import ExitStack, contextmanager
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.backends.utils import CursorWrapper
+from django.db.models import Count
+from django.template.backends.django import Template
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Follow, Group, Post
+
+
+User = get_user_model()
+
+# Метрики в отчёте; все — «меньше — лучше».
+METRICS = ('p50_ms', 'p95_ms', 'render_ms', 'queries', 'rows')
+
+
+def percentile(values, share):
+    """Значение ранга ceil(share · n) в отсортированной выборке."""
+    values = sorted(values)
+    return values[max(0, math.ceil(share * len(values)) - 1)]
+
+
+@contextmanager
+def count_rows():
+    """Считает строки, прочитанные из курсоров базы, в список total."""
+    total = [0]
+
+    def fetchone(self):
+        row = self.cursor.fetchone()
+        total[0] += row is not None
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self.cursor.fetchmany(*args, **kwargs)
+        total[0] += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self.cursor.fetchall()
+        total[0] += len(rows)
+        return rows
+
+    with ExitStack() as stack:
+        for method in (fetchone, fetchmany, fetchall):
+            stack.enter_context(mock.patch.object(
+                CursorWrapper, method.__name__, method, create=True
+            ))
+        yield total
+
+
+@contextmanager
+def time_rendering():
+    """Суммирует время render() шаблонов верхнего уровня в список."""
+    spent = [0.0]
+    render = Template.render
+
+    def timed(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            spent[0] += time.perf_counter() - started
+
+    with mock.patch.object(Template, 'render', timed):
+        yield spent
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет все страницы и действия posts на синтетических наборах '
+        'нескольких размеров: p50/p95 времени ответа, число запросов, '
+        'прочитанные строки и время рендеринга шаблонов, с пустым и '
+        'прогретым кешем. Пишет JSON для сравнения коммитов; данные '
+        'откатываются, но кеш очищается — запускать на копии базы.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[1000, 10000],
+            help='Размеры наборов в постах; пользователей вдесятеро '
+                 'меньше, комментариев вдвое больше.',
+        )
+        parser.add_argument('--repeat', type=int, default=30)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--output', help='Куда записать результаты в JSON.',
+        )
+        parser.add_argument(
+            '--baseline',
+            help='JSON прошлого запуска: напечатать изменения метрик.',
+        )
+
+    def handle(self, *args, **options):
+        self.repeat = options['repeat']
+        report = {
+            'commit': git_commit(),
+            'created': timezone.now().isoformat(),
+            'vendor': connection.vendor,
+            'repeat': self.repeat,
+            'seed': options['seed'],
+            'sizes': {},
+        }
+        # Без отладочной панели и журнала запросов, как на боевом сервере.
+        with override_settings(DEBUG=False):
+            for size in options['sizes']:
+                report['sizes'][str(size)] = self.bench_size(
+                    size, options['seed']
+                )
+        self.print_report(report)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file_:
+                json.dump(report, file_, ensure_ascii=False, indent=2)
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as file_:
+                self.compare(json.load(file_), report)
+
+    def bench_size(self, size, seed):
+        with transaction.atomic():
+            call_command(
+                'generate_data', prefix=f'bench{size}_', seed=seed,
+                posts=size, users=max(size // 10, 10), comments=size * 2,
+                stdout=io.StringIO(),
+            )
+            results = {
+                name: self.measure(request)
+                for name, request in self.requests(f'bench{size}_')
+            }
+            transaction.set_rollback(True)
+        cache.clear()
+        return results
+
+    def requests(self, prefix):
+        """Пары (имя, функция запроса) для всех view приложения.
+
+        Берутся самые тяжёлые объекты набора: популярная группа и автор,
+        пост с наибольшим числом комментариев, читатель с наибольшим
+        числом подписок.
+        """
+        users = User.objects.filter(username__startswith=prefix)
+        author = users.order_by('pk').first()
+        reader = users.annotate(
+            follows=Count('follower')
+        ).order_by('-follows', 'pk').first()
+        group = Group.objects.filter(
+            slug__startswith=f'{prefix}-'
+        ).order_by('pk').first()
+        post = Post.objects.filter(author__in=users).annotate(
+            comment_count=Count('comments')
+        ).order_by('-comment_count', 'pk').first()
+        target = users.exclude(pk=reader.pk).exclude(
+            pk__in=Follow.objects.filter(user=reader).values('author')
+        ).order_by('pk').first()
+        guest = Client()
+        client = Client()
+        client.force_login(reader)
+
+        def follow_cycle():
+            kwargs = {'username': target.username}
+            client.get(reverse('posts:profile_follow', kwargs=kwargs))
+            return client.get(
+                reverse('posts:profile_unfollow', kwargs=kwargs)
+            )
+
+        return [
+            ('index', lambda: guest.get(reverse('posts:index'))),
+            ('group_posts', lambda: guest.get(reverse(
+                'posts:group_list', kwargs={'slug': group.slug}
+            ))),
+            ('profile', lambda: guest.get(reverse(
+                'posts:profile', kwargs={'username': author.username}
+            ))),
+            ('post_detail', lambda: guest.get(reverse(
+                'posts:post_detail', kwargs={'post_id': post.pk}
+            ))),
+            ('follow_index', lambda: client.get(
+                reverse('posts:follow_index')
+            )),
+            ('post_create', lambda: client.post(
+                reverse('posts:post_create'), {'text': 'Замер'}
+            )),
+            ('add_comment', lambda: client.post(reverse(
+                'posts:add_comment', kwargs={'post_id': post.pk}
+            ), {'text': 'Замер'})),
+            ('follow_unfollow', follow_cycle),
+        ]
+
+    def measure(self, request):
+        """Метрики запроса с пустым кешем и с прогретым."""
+        request()
+        return {
+            'cold': self.run(request, cache.clear),
+            'warm': self.run(request, lambda: None),
+        }
+
+    def run(self, request, prepare):
+        latencies, renders = [], []
+        for _ in range(self.repeat):
+            prepare()
+            with time_rendering() as spent:
+                started = time.perf_counter()
+                response = request()
+                latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400:
+                raise CommandError(
+                    f'Ответ {response.status_code} на '
+                    f'{response.request["PATH_INFO"]}'
+                )
+            renders.append(spent[0] * 1000)
+        # Запросы и строки считаются отдельным прогоном: журнал
+        # запросов замедляет ответ.
+        prepare()
+        with CaptureQueriesContext(connection) as queries, \
+                count_rows() as rows:
+            request()
+        return {
+            'p50_ms': round(statistics.median(latencies), 2),
+            'p95_ms': round(percentile(latencies, 0.95), 2),
+            'render_ms': round(statistics.median(renders), 2),
+            'queries': len(queries),
+            'rows': rows[0],
+        }
+
+    def print_report(self, report):
+        self.stdout.write(
+            f'{report["vendor"]}, коммит {report["commit"]}, '
+            f'повторов {report["repeat"]}'
+        )
+        for size, views in report['sizes'].items():
+            self.stdout.write(f'Постов: {size}')
+            for name, modes in views.items():
+                for mode, metrics in modes.items():
+                    self.stdout.write(
+                        f'  {name:<16} {mode:<5} '
+                        f'p50 {metrics["p50_ms"]:7.2f} мс  '
+                        f'p95 {metrics["p95_ms"]:7.2f} мс  '
+                        f'шаблоны {metrics["render_ms"]:6.2f} мс  '
+                        f'запросов {metrics["queries"]:3}  '
+                        f'строк {metrics["rows"]}'
+                    )
+
+    def compare(self, baseline, report):
+        """Изменения метрик относительно прошлого запуска, в процентах."""
+        self.stdout.write(f'Сравнение с {baseline.get("commit")}:')
+        for size, views in report['sizes'].items():
+            for name, modes in views.items():
+                for mode, metrics in modes.items():
+                    old = baseline['sizes'].get(size, {}).get(
+                        name, {}
+                    ).get(mode)
+                    if old is None:
+                        continue
+                    changes = ', '.join(
+                        f'{metric} {self.change(old[metric], metrics[metric])}'
+                        for metric in METRICS
+                    )
+                    self.stdout.write(f'  {size} {name} {mode}: {changes}')
+
+    def change(self, old, new):
+        if old == new:
+            return '='
+        if not old:
+            return f'{old}→{new}'
+        return f'{(new - old) / old:+.0%}'
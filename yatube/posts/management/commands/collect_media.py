@@ -0,0 +1,60 @@
+import posixpath
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from sorl.thumbnail import delete
+from sorl.thumbnail.images import ImageFile
+
+from posts.models import Post
+
+
+def walk(storage, path):
+    """Имена всех файлов в каталоге хранилища и его подкаталогах."""
+    if not storage.exists(path):
+        return
+    directories, files = storage.listdir(path)
+    for name in files:
+        yield posixpath.join(path, name)
+    for directory in directories:
+        yield from walk(storage, posixpath.join(path, directory))
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет картинки постов, на которые не ссылается ни один пост, '
+        'вместе с их миниатюрами.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, что будет удалено.',
+        )
+        parser.add_argument(
+            '--min-age', type=int, default=3600,
+            help='Не трогать файлы моложе стольких секунд: их пост '
+                 'может быть ещё не сохранён.',
+        )
+
+    def handle(self, *args, **options):
+        field = Post._meta.get_field('image')
+        storage = field.storage
+        referenced = set(
+            Post.objects.exclude(image='').values_list('image', flat=True)
+        )
+        cutoff = timezone.now() - timedelta(seconds=options['min_age'])
+        removed = freed = 0
+        for name in walk(storage, field.upload_to.rstrip('/')):
+            if name in referenced or storage.get_modified_time(name) > cutoff:
+                continue
+            removed += 1
+            freed += storage.size(name)
+            if options['verbosity'] > 1:
+                self.stdout.write(name)
+            if not options['dry_run']:
+                delete(ImageFile(name, storage))
+        verb = 'Будет удалено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} файлов: {removed}, {freed / 1024:.1f} КБ'
+        ))
@@ -0,0 +1,54 @@
+import json
+import time
+
+from django.core import serializers
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+
+from posts import dumps
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает пользователей, группы, посты, комментарии и подписки '
+        'в NDJSON по одной записи на строку, не загружая таблицы в память.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Файл дампа, «-» — stdout; *.gz пишется сжатым.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько строк читать из базы за один запрос.',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        total = 0
+        with dumps.open_dump(options['path'], 'wt') as file_:
+            for model in dumps.dump_models():
+                count = self.export(model, file_, options['batch_size'])
+                total += count
+                self.stderr.write(f'{model._meta.label_lower}: {count}')
+        elapsed = time.perf_counter() - started
+        self.stderr.write(self.style.SUCCESS(
+            f'Выгружено записей: {total} за {elapsed:.1f} с'
+        ))
+
+    def export(self, model, file_, batch_size):
+        fields = dumps.exported_fields(model)
+        objects = model._default_manager.order_by('pk').iterator(
+            chunk_size=batch_size
+        )
+        count = 0
+        for batch in dumps.batched(objects, batch_size):
+            for record in serializers.serialize(
+                'python', batch, fields=fields
+            ):
+                file_.write(json.dumps(
+                    record, cls=DjangoJSONEncoder, ensure_ascii=False
+                ) + '\n')
+            count += len(batch)
+        return count
@@ -0,0 +1,34 @@
+from core.caches import cache_stats, reset_cache_stats
+from django.core.management.base import BaseCommand
+
+
+DESCRIPTIONS = {
+    'hit': 'свежая копия',
+    'early': 'досрочный пересчёт',
+    'stale': 'устаревшая копия на время пересчёта',
+    'refresh': 'пересчёт после срока',
+    'miss': 'пересчёт при промахе',
+    'coalesced': 'дождались чужого пересчёта',
+    'lock_timeout': 'не дождались, пересчитали сами',
+}
+
+
+class Command(BaseCommand):
+    help = 'Показывает, как кеш лент отвечал на запросы.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Обнулить счётчики после вывода.'
+        )
+
+    def handle(self, *args, **options):
+        stats = cache_stats()
+        total = sum(stats.values()) or 1
+        for event, count in stats.items():
+            self.stdout.write(
+                f'{event:<13} {count:>8} {count / total:>7.1%}  '
+                f'{DESCRIPTIONS[event]}'
+            )
+        if options['reset']:
+            reset_cache_stats()
@@ -0,0 +1,264 @@
+import io
+import itertools
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from PIL import Image
+
+from posts import dumps
+from posts.models import Comment, Follow, Group, Post
+
+
+User = get_user_model()
+
+# Даты отсчитываются от постоянного момента: один seed — один набор.
+END = datetime(2022, 1, 1, tzinfo=timezone.utc)
+WORDS = (
+    'кот собака дом город утро вечер ночь лето зима весна осень река море '
+    'лес поле дорога друг книга письмо окно дверь сад небо солнце дождь '
+    'снег ветер огонь вода хлеб чай кофе работа отпуск поезд самолёт '
+    'музыка песня фильм театр картина фото прогулка встреча праздник '
+    'новый старый большой маленький тёплый холодный быстрый тихий '
+    'красивый смешной грустный добрый долгий первый последний '
+    'идти ехать читать писать смотреть слушать думать любить жить '
+    'ждать видеть знать помнить гулять спать готовить петь играть '
+    'сегодня вчера завтра снова всегда иногда очень немного далеко рядом'
+).split()
+# Размеры синтетических картинок: пейзаж, портрет и квадрат.
+IMAGE_SIZES = ((800, 600), (1024, 768), (600, 800), (640, 640))
+# Показатель распределения Парето для числа подписок пользователя:
+# при 1.5 среднее — втрое больше минимума, хвост тяжёлый.
+FOLLOW_SHAPE = 1.5
+
+
+def zipf(count, skew):
+    """Накопленные веса закона Ципфа: вес ранга r — 1 / r ** skew."""
+    return list(itertools.accumulate(
+        1 / rank ** skew for rank in range(1, count + 1)
+    ))
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт воспроизводимый синтетический набор данных для замеров: '
+        'пользователей со степенным графом подписок, посты по группам, '
+        'комментарии с длинным хвостом и, по желанию, картинки. '
+        'Пишет пакетами bulk_create, индексы и счётчики строит в конце.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument(
+            '--comments', type=int, default=20000,
+            help='Всего комментариев; по постам распределены по Ципфу.',
+        )
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Среднее число подписок пользователя.',
+        )
+        parser.add_argument(
+            '--images', type=float, default=0,
+            help='Доля постов с картинкой, от 0 до 1.',
+        )
+        parser.add_argument(
+            '--image-pool', type=int, default=20,
+            help='Сколько разных картинок создать для всех постов.',
+        )
+        parser.add_argument(
+            '--skew', type=float, default=1.0,
+            help='Показатель Ципфа для популярности авторов и групп.',
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней до 2022-01-01 распределены посты.',
+        )
+        parser.add_argument(
+            '--prefix', default='synthetic',
+            help='Начало имён пользователей и адресов групп.',
+        )
+        parser.add_argument(
+            '--password',
+            help='Пароль всех пользователей; без него войти нельзя.',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.rng = random.Random(options['seed'])
+        self.word_weights = zipf(len(WORDS), 1.0)
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(
+                f'Пользователи с префиксом «{prefix}» уже есть, '
+                'задайте другой --prefix.'
+            )
+        started = time.perf_counter()
+        with transaction.atomic(), dumps.dump_dates(Post, Comment) as fill:
+            self.fill_dates = fill
+            users = self.create_users()
+            groups = self.create_groups()
+            follows = self.create_follows(users)
+            images = self.create_images()
+            posts = self.create_posts(users, groups, images)
+            comments = self.create_comments(users, posts)
+        call_command('rebuild_post_counters', stdout=io.StringIO())
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        cache.clear()
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано: {len(users)} пользователей, {len(groups)} групп, '
+            f'{follows} подписок, {len(posts)} постов, {comments} '
+            f'комментариев за {time.perf_counter() - started:.1f} с'
+        ))
+
+    def insert(self, model, objects):
+        """bulk_create пакетами; возвращает число вставленных строк."""
+        total = 0
+        for batch in dumps.batched(objects, self.options['batch_size']):
+            self.fill_dates(batch)
+            model.objects.bulk_create(batch)
+            total += len(batch)
+        if self.options['verbosity'] > 1:
+            self.stderr.write(f'{model._meta.label_lower}: {total}')
+        return total
+
+    def sentence(self, low, high):
+        words = self.rng.choices(
+            WORDS, cum_weights=self.word_weights, k=self.rng.randint(low, high)
+        )
+        return ' '.join(words).capitalize() + '.'
+
+    def create_users(self):
+        """id пользователей по убыванию популярности."""
+        prefix = self.options['prefix']
+        password = make_password(self.options['password'])
+        self.insert(User, (
+            User(username=f'{prefix}{i}', password=password)
+            for i in range(self.options['users'])
+        ))
+        return list(User.objects.filter(
+            username__startswith=prefix
+        ).order_by('pk').values_list('pk', flat=True))
+
+    def create_groups(self):
+        prefix = self.options['prefix']
+        self.insert(Group, (
+            Group(
+                title=f'Группа {i}', slug=f'{prefix}-{i}',
+                description=self.sentence(5, 20),
+            )
+            for i in range(self.options['groups'])
+        ))
+        return list(Group.objects.filter(
+            slug__startswith=f'{prefix}-'
+        ).order_by('pk').values_list('pk', flat=True))
+
+    def create_follows(self, users):
+        """Граф подписок со степенным распределением подписчиков.
+
+        Число подписок пользователя — по Парето, на кого подписаться —
+        по Ципфу от популярности: у немногих авторов тысячи подписчиков.
+        """
+        weights = zipf(len(users), self.options['skew'])
+        scale = self.options['follows'] * (FOLLOW_SHAPE - 1) / FOLLOW_SHAPE
+
+        def follows():
+            for user_id in users:
+                degree = min(
+                    len(users) - 1,
+                    int(self.rng.paretovariate(FOLLOW_SHAPE) * scale),
+                )
+                authors = set(self.rng.choices(
+                    users, cum_weights=weights, k=degree
+                ))
+                for author_id in sorted(authors - {user_id}):
+                    yield Follow(user_id=user_id, author_id=author_id)
+        return self.insert(Follow, follows())
+
+    def create_images(self):
+        """Имена и размеры картинок в хранилище постов."""
+        if not self.options['images']:
+            return []
+        storage = Post._meta.get_field('image').storage
+        images = []
+        for i in range(self.options['image_pool']):
+            size = self.rng.choice(IMAGE_SIZES)
+            color = tuple(self.rng.randrange(256) for _ in range(3))
+            content = io.BytesIO()
+            Image.new('RGB', size, color).save(content, 'JPEG')
+            name = storage.save(
+                f'posts/synthetic{i}.jpg', ContentFile(content.getvalue())
+            )
+            images.append((name, *size))
+        return images
+
+    def create_posts(self, users, groups, images):
+        """Посты по возрастанию даты: пары (id, дата публикации).
+
+        Авторы и группы выбираются по Ципфу, пятая часть постов —
+        без группы.
+        """
+        count = self.options['posts']
+        author_weights = zipf(len(users), self.options['skew'])
+        group_weights = zipf(len(groups), self.options['skew'])
+        step = timedelta(days=self.options['days']) / max(count, 1)
+        start = END - timedelta(days=self.options['days'])
+        dates = [
+            start + step * (i + self.rng.random()) for i in range(count)
+        ]
+
+        def posts():
+            for pub_date in dates:
+                post = Post(
+                    text=self.sentence(5, 60), pub_date=pub_date,
+                    author_id=self.rng.choices(
+                        users, cum_weights=author_weights
+                    )[0],
+                )
+                if groups and self.rng.random() >= 0.2:
+                    post.group_id = self.rng.choices(
+                        groups, cum_weights=group_weights
+                    )[0]
+                if images and self.rng.random() < self.options['images']:
+                    (post.image, post.image_width,
+                     post.image_height) = self.rng.choice(images)
+                yield post
+        self.insert(Post, posts())
+        ids = Post.objects.filter(
+            author__username__startswith=self.options['prefix']
+        ).order_by('pk').values_list('pk', flat=True)
+        return list(zip(ids, dates))
+
+    def create_comments(self, users, posts):
+        """Комментарии с длинным хвостом: почти все — у немногих постов,
+        большинство постов без комментариев. Популярность поста не
+        зависит от его даты."""
+        if not posts:
+            return 0
+        order = list(posts)
+        self.rng.shuffle(order)
+        weights = zipf(len(order), self.options['skew'])
+
+        def comments():
+            for _ in range(self.options['comments']):
+                post_id, pub_date = self.rng.choices(
+                    order, cum_weights=weights
+                )[0]
+                yield Comment(
+                    post_id=post_id, author_id=self.rng.choice(users),
+                    text=self.sentence(2, 25),
+                    pub_date=pub_date + timedelta(
+                        hours=self.rng.expovariate(1 / 12)
+                    ),
+                )
+        return self.insert(Comment, comments())
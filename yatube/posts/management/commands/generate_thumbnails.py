@@ -0,0 +1,50 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Готовит миниатюры для всех картинок постов в несколько потоков; '
+        'уже готовые пропускаются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+
+    def handle(self, *args, **options):
+        images = list(
+            Post.objects.exclude(image='').order_by().values_list(
+                'image', 'image_width'
+            ).distinct()
+        )
+        started = time.perf_counter()
+        if options['workers'] > 1:
+            with ThreadPoolExecutor(options['workers']) as pool:
+                failed = sum(pool.map(self.work, images))
+        else:
+            failed = sum(map(self.generate, images))
+        self.stdout.write(self.style.SUCCESS(
+            f'Картинок: {len(images)}, ошибок: {failed}, '
+            f'{time.perf_counter() - started:.1f} с'
+        ))
+
+    def generate(self, image):
+        name, width = image
+        try:
+            thumbnails.generate(name, width)
+        except Exception as error:
+            self.stderr.write(f'{name}: {error}')
+            return 1
+        return 0
+
+    def work(self, image):
+        try:
+            return self.generate(image)
+        finally:
+            connection.close()
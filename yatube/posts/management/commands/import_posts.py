@@ -0,0 +1,145 @@
+import time
+from collections import Counter
+
+from django.core import serializers
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from posts import dumps
+from posts.models import Comment, Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает дамп export_posts или dumpdata потоково, пакетами '
+        'bulk_create; индексы поиска и счётчики пересчитываются один раз '
+        'в конце. Записи других моделей пропускаются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='NDJSON или JSON-массив, «-» — stdin, *.gz — сжатый.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько объектов вставлять за один INSERT.',
+        )
+        parser.add_argument(
+            '--progress', type=int, default=10000,
+            help='Печатать прогресс каждые столько записей, 0 — никогда.',
+        )
+        parser.add_argument(
+            '--defer-indexes', action='store_true',
+            help='Снять индексы постов и комментариев на время загрузки '
+                 'и построить их заново в конце.',
+        )
+        parser.add_argument(
+            '--ignore-conflicts', action='store_true',
+            help='Пропускать строки, которые уже есть в базе.',
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.loaded = Counter()
+        self.skipped = 0
+        self.pending = {}
+        self.started = time.perf_counter()
+        models = dumps.dump_models()
+        self.labels = {model._meta.label_lower for model in models}
+        deferred = [Post, Comment] if options['defer_indexes'] else []
+        # Схему SQLite нельзя менять внутри транзакции, поэтому индексы
+        # снимаются до неё и строятся после.
+        self.drop_indexes(deferred)
+        try:
+            with transaction.atomic(), dumps.dump_dates(*models) as fill:
+                self.fill_dates = fill
+                self.load(options['path'])
+                dumps.reset_sequences(models)
+        finally:
+            self.create_indexes(deferred)
+        self.rebuild()
+        self.report()
+
+    def load(self, path):
+        with dumps.open_dump(path, 'rt') as file_:
+            for record in dumps.iter_records(file_):
+                self.add(record)
+        for model in list(self.pending):
+            self.flush(model)
+
+    def add(self, record):
+        if record.get('model', '').lower() not in self.labels:
+            self.skipped += 1
+            return
+        (obj,) = serializers.deserialize(
+            'python', [record], ignorenonexistent=True
+        )
+        model = type(obj.object)
+        batch = self.pending.setdefault(model, [])
+        batch.append(obj.object)
+        if len(batch) >= self.options['batch_size']:
+            self.flush(model)
+
+    def flush(self, model):
+        """Вставляет накопленные объекты модели одним bulk_create.
+
+        Модели загружаются в порядке зависимостей, поэтому перед
+        записями модели сбрасываются и все отложенные до неё.
+        """
+        for other in list(self.pending):
+            objects = self.pending.pop(other)
+            self.fill_dates(objects)
+            other._default_manager.bulk_create(
+                objects, ignore_conflicts=self.options['ignore_conflicts']
+            )
+            self.count(other, len(objects))
+            if other is model:
+                break
+
+    def count(self, model, number):
+        every = self.options['progress']
+        before = sum(self.loaded.values())
+        self.loaded[model._meta.label_lower] += number
+        if every and before // every != (before + number) // every:
+            self.stderr.write(
+                f'Загружено {before + number} записей, '
+                f'{self.rate(before + number):.0f} в секунду'
+            )
+
+    def rate(self, number):
+        return number / max(time.perf_counter() - self.started, 1e-6)
+
+    def drop_indexes(self, models):
+        if not models:
+            return
+        with connection.schema_editor() as editor:
+            for model in models:
+                for index in model._meta.indexes:
+                    editor.remove_index(model, index)
+
+    def create_indexes(self, models):
+        if not models:
+            return
+        with connection.schema_editor() as editor:
+            for model in models:
+                for index in model._meta.indexes:
+                    editor.add_index(model, index)
+
+    def rebuild(self):
+        """Всё, что сигналы поддерживают при обычном сохранении."""
+        call_command('rebuild_post_counters', stdout=self.stderr)
+        call_command('rebuild_search_index', stdout=self.stderr)
+        cache.clear()
+
+    def report(self):
+        total = sum(self.loaded.values())
+        for label, number in sorted(self.loaded.items()):
+            self.stdout.write(f'{label}: {number}')
+        if self.skipped:
+            self.stdout.write(f'Пропущено записей других моделей: '
+                              f'{self.skipped}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено записей: {total}, {self.rate(total):.0f} в секунду'
+        ))
@@ -0,0 +1,137 @@
+import random
+import statistics
+import threading
+import time
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from posts.models import Group, Post
+
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает сайт смешанными запросами чтения и записи из нескольких '
+        'потоков и выводит пропускную способность. Запускать на копии базы: '
+        'созданные пользователи и их посты удаляются в конце.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--seconds', type=float, default=10)
+        parser.add_argument(
+            '--write-ratio', type=float, default=0.2,
+            help='Доля запросов post_create и add_comment.'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        prefix = f'load{rng.randrange(10 ** 9)}_'
+        users = [
+            User.objects.create(username=f'{prefix}{i}')
+            for i in range(options['threads'])
+        ]
+        group = Group.objects.create(
+            title=prefix, slug=prefix, description='Нагрузочный тест'
+        )
+        post = Post.objects.create(text='Пост', author=users[0], group=group)
+        self.urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': group.slug}),
+            reverse('posts:profile', kwargs={'username': users[0].username}),
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}),
+        ]
+        self.comment_url = reverse(
+            'posts:add_comment', kwargs={'post_id': post.pk}
+        )
+        self.timings = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lock = threading.Lock()
+        deadline = time.perf_counter() + options['seconds']
+        threads = [
+            threading.Thread(target=self.work, args=(
+                user, random.Random(rng.random()), deadline,
+                options['write_ratio'],
+            ))
+            for user in users
+        ]
+        started = time.perf_counter()
+        # Без отладочной панели и журнала запросов, как на боевом сервере.
+        with override_settings(DEBUG=False):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        elapsed = time.perf_counter() - started
+        try:
+            self.report(elapsed, options)
+        finally:
+            User.objects.filter(username__startswith=prefix).delete()
+            group.delete()
+
+    def work(self, user, rng, deadline, write_ratio):
+        client = Client()
+        client.force_login(user)
+        try:
+            while time.perf_counter() < deadline:
+                if rng.random() < write_ratio:
+                    kind = rng.choice(('post_create', 'add_comment'))
+                    request = self.write_request(client, kind)
+                else:
+                    kind = 'read'
+                    url = rng.choice(self.urls)
+                    request = lambda: client.get(url)  # noqa: E731
+                self.measure(kind, request)
+        finally:
+            connection.close()
+
+    def write_request(self, client, kind):
+        if kind == 'post_create':
+            return lambda: client.post(
+                reverse('posts:post_create'), {'text': 'Нагрузка'}
+            )
+        return lambda: client.post(self.comment_url, {'text': 'Нагрузка'})
+
+    def measure(self, kind, request):
+        started = time.perf_counter()
+        try:
+            response = request()
+            failed = response.status_code >= 400
+        except Exception:
+            failed = True
+        elapsed = (time.perf_counter() - started) * 1000
+        with self.lock:
+            if failed:
+                self.errors[kind] += 1
+            else:
+                self.timings[kind].append(elapsed)
+
+    def report(self, elapsed, options):
+        total = sum(len(items) for items in self.timings.values())
+        self.stdout.write(
+            f'{connection.vendor}, потоков {options["threads"]}, '
+            f'доля записи {options["write_ratio"]:.0%}, {elapsed:.1f} с'
+        )
+        self.stdout.write(
+            f'Успешных запросов: {total}, {total / elapsed:.1f} в секунду, '
+            f'ошибок: {sum(self.errors.values())}'
+        )
+        for kind in ('read', 'post_create', 'add_comment'):
+            timings = sorted(self.timings[kind])
+            if not timings:
+                continue
+            self.stdout.write(
+                f'  {kind}: {len(timings)}, '
+                f'p50 {statistics.median(timings):.1f} мс, '
+                f'p95 {timings[int(len(timings) * 0.95) - 1]:.1f} мс, '
+                f'ошибок {self.errors[kind]}'
+            )
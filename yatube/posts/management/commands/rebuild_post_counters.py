@@ -0,0 +1,41 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from posts.models import AuthorCounter
+
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает сохранённые счётчики постов всех авторов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько счётчиков записывать за один INSERT.'
+        )
+
+    def handle(self, *args, **options):
+        authors = User.objects.annotate(
+            posts_count=Count('name')
+        ).values_list('pk', 'posts_count').iterator()
+        counters = (
+            AuthorCounter(author_id=pk, posts_count=posts_count)
+            for pk, posts_count in authors
+        )
+        with transaction.atomic():
+            AuthorCounter.objects.all().delete()
+            total = 0
+            batch = []
+            for counter in counters:
+                batch.append(counter)
+                if len(batch) >= options['batch_size']:
+                    total += len(AuthorCounter.objects.bulk_create(batch))
+                    batch = []
+            total += len(AuthorCounter.objects.bulk_create(batch))
+        self.stdout.write(
+            self.style.SUCCESS(f'Пересчитано счётчиков: {total}')
+        )
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = (
+        'Заново строит поисковый индекс постов: после bulk_create, '
+        'загрузки дампа или переезда на базу без FTS5.'
+    )
+
+    def handle(self, *args, **options):
+        index = search.writing_index()
+        started = time.perf_counter()
+        index.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'{type(index).__name__}: {time.perf_counter() - started:.1f} с'
+        ))
@@ -0,0 +1,73 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:54
+
+from django.db import migrations, models
+import re
+
+import django.db.models.deletion
+
+
+WORD = re.compile(r'\w+')
+
+
+def document(text):
+    folded = text.casefold().replace('ё', 'е')
+    return ' '.join(word[:64] for word in WORD.findall(folded))
+
+
+def create_fts(apps, schema_editor):
+    """Таблица FTS5 со словами постов, если SQLite собран с FTS5."""
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        if not cursor.fetchone()[0]:
+            return
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE posts_post_fts USING fts5(body)'
+    )
+    Post = apps.get_model('posts', 'Post')
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            'INSERT INTO posts_post_fts(rowid, body) VALUES (%s, %s)', [
+                (pk, document(text))
+                for pk, text in Post.objects.values_list('pk', 'text')
+            ]
+        )
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS posts_post_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_post_image_storage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, verbose_name='Слово')),
+                ('count', models.PositiveIntegerField(verbose_name='Вхождений')),
+                ('post', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='terms', to='posts.Post', verbose_name='Пост')),
+            ],
+            options={
+                'verbose_name': 'Слово поста',
+                'verbose_name_plural': 'Слова постов',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='postterm',
+            index=models.Index(fields=['term'], name='post_term_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='postterm',
+            constraint=models.UniqueConstraint(fields=('post', 'term'), name='unique post term'),
+        ),
+        migrations.RunPython(create_fts, drop_fts),
+    ]
@@ -0,0 +1,241 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:57
+
+import re
+from collections import defaultdict
+
+from django.db import migrations
+import posts.analysis
+
+
+BATCH_SIZE = 1000
+
+# Копия разбора из posts.analysis на момент миграции: историческая
+# миграция не должна меняться вместе с живым стеммером.
+WORD = re.compile(r'\w+')
+VOWELS = 'аеиоуыэюя'
+MAX_TOKEN_LENGTH = 64
+
+STOP_WORDS = frozenset('''
+    и в во не что он на я с со как а то все она так его но да ты к у же
+    вы за бы по только ее мне было вот от меня еще нет о из ему теперь
+    когда даже ну вдруг ли если уже или ни быть был него до вас нибудь
+    опять уж вам ведь там потом себя ничего ей может они тут где есть
+    надо ней для мы тебя их чем была сам чтоб без будто чего раз тоже
+    себе под будет ж тогда кто этот того потому этого какой совсем ним
+    здесь этом один почти мой тем чтобы нее сейчас были куда зачем всех
+    никогда можно при наконец два об другой хоть после над больше тот
+    через эти нас про всего них какая много разве три эту моя впрочем
+    хорошо свою этой перед иногда лучше чуть том нельзя такой им более
+    всегда конечно всю между
+'''.split())
+
+
+def endings(*groups):
+    """Окончания по убыванию длины: (окончание, нужно ли «а»/«я» перед ним).
+
+    Каждая группа — пара (после «а»/«я», без условия).
+    """
+    table = {}
+    for after_a, plain in groups:
+        table.update({ending: True for ending in after_a.split()})
+        table.update({ending: False for ending in plain.split()})
+    return sorted(table.items(), key=lambda item: -len(item[0]))
+
+
+PERFECTIVE_GERUND = endings(
+    ('в вши вшись', 'ив ивши ившись ыв ывши ывшись'),
+)
+ADJECTIVE = endings((
+    '', 'ее ие ые ое ими ыми ей ий ый ой ем им ым ом его ого ему ому их '
+    'ых ую юю ая яя ою ею'
+),)
+PARTICIPLE = endings(('ем нн вш ющ щ', 'ивш ывш ующ'))
+REFLEXIVE = endings(('', 'ся сь'))
+VERB = endings((
+    'ла на ете йте ли й л ем н ло но ет ют ны ть ешь нно',
+    'ила ыла ена ейте уйте ите или ыли ей уй ил ыл им ым ен ило ыло ено '
+    'ят ует уют ит ыт ены ить ыть ишь ую ю'
+),)
+NOUN = endings((
+    '', 'а ев ов ие ье е иями ями ами еи ии и ией ей ой ий й иям ям ием ем '
+    'ам ом о у ах иях ях ы ь ию ью ю ия ья я'
+),)
+DERIVATIONAL = ('ость', 'ост')
+SUPERLATIVE = ('ейше', 'ейш')
+
+
+def remove_ending(rv, table):
+    """RV без самого длинного окончания из таблицы или None.
+
+    Как в Snowball, берётся самое длинное совпадение; если его условие
+    не выполнено, более короткие не пробуются.
+    """
+    for ending, after_a in table:
+        if rv.endswith(ending):
+            if after_a and rv[:-len(ending)][-1:] not in ('а', 'я'):
+                return None
+            return rv[:-len(ending)]
+    return None
+
+
+def regions(word):
+    """Начала областей RV и R2 в слове."""
+    rv = next(
+        (i + 1 for i, char in enumerate(word) if char in VOWELS), len(word)
+    )
+    r1 = r2 = len(word)
+    for i in range(1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            r1 = i + 1
+            break
+    for i in range(r1 + 1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            r2 = i + 1
+            break
+    return rv, r2
+
+
+def strip_inflection(rv):
+    """Шаг 1: деепричастие или возвратность и окончание формы."""
+    stripped = remove_ending(rv, PERFECTIVE_GERUND)
+    if stripped is not None:
+        return stripped
+    reflexive = remove_ending(rv, REFLEXIVE)
+    if reflexive is not None:
+        rv = reflexive
+    stripped = remove_ending(rv, ADJECTIVE)
+    if stripped is not None:
+        participle = remove_ending(stripped, PARTICIPLE)
+        return stripped if participle is None else participle
+    for table in (VERB, NOUN):
+        stripped = remove_ending(rv, table)
+        if stripped is not None:
+            return stripped
+    return rv
+
+
+def tidy_up(rv):
+    """Шаг 4: превосходная степень, двойное «н» и мягкий знак."""
+    for ending in SUPERLATIVE:
+        if rv.endswith(ending):
+            rv = rv[:-len(ending)]
+            return rv[:-1] if rv.endswith('нн') else rv
+    if rv.endswith('нн') or rv.endswith('ь'):
+        return rv[:-1]
+    return rv
+
+
+def stem(word):
+    """Основа слова; слова без русских гласных не меняются."""
+    rv, r2 = regions(word)
+    head, tail = word[:rv], strip_inflection(word[rv:])
+    if tail.endswith('и'):
+        tail = tail[:-1]
+    for ending in DERIVATIONAL:
+        if tail.endswith(ending):
+            if len(head) + len(tail) - len(ending) >= r2:
+                tail = tail[:-len(ending)]
+            break
+    return head + tidy_up(tail)
+
+
+def analyze(text):
+    """Основы слов текста: нижний регистр, «ё» как «е», без стоп-слов."""
+    words = WORD.findall(text.casefold().replace('ё', 'е'))
+    return [
+        stem(word)[:MAX_TOKEN_LENGTH]
+        for word in words if word not in STOP_WORDS
+    ]
+
+
+def fill_tokens(model):
+    objects = model.objects.only('text')
+    batch = []
+    for obj in objects.iterator():
+        obj.search_tokens = ' '.join(analyze(obj.text))
+        batch.append(obj)
+        if len(batch) >= BATCH_SIZE:
+            model.objects.bulk_update(batch, ['search_tokens'])
+            batch = []
+    model.objects.bulk_update(batch, ['search_tokens'])
+
+
+def analyze_texts(apps, schema_editor):
+    """Основы слов уже сохранённых постов и комментариев."""
+    fill_tokens(apps.get_model('posts', 'Post'))
+    fill_tokens(apps.get_model('posts', 'Comment'))
+
+
+def has_fts(schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        return 'posts_post_fts' in connection.introspection.table_names(
+            cursor
+        )
+
+
+def recreate_fts(apps, schema_editor):
+    """FTS5 по сохранённым основам: текст поста и его комментарии.
+
+    Слова поста весят вдвое больше слов комментариев.
+    """
+    if not has_fts(schema_editor):
+        return
+    schema_editor.execute('DROP TABLE posts_post_fts')
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE posts_post_fts USING fts5(body, comments)'
+    )
+    schema_editor.execute(
+        "INSERT INTO posts_post_fts(posts_post_fts, rank) "
+        "VALUES ('rank', 'bm25(2.0, 1.0)')"
+    )
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    comments = defaultdict(list)
+    for post_id, tokens in Comment.objects.values_list(
+        'post_id', 'search_tokens'
+    ).iterator():
+        comments[post_id].append(tokens)
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            'INSERT INTO posts_post_fts(rowid, body, comments) '
+            'VALUES (%s, %s, %s)', [
+                (pk, tokens, ' '.join(comments[pk]))
+                for pk, tokens in Post.objects.values_list(
+                    'pk', 'search_tokens'
+                ).iterator()
+            ]
+        )
+
+
+def restore_fts(apps, schema_editor):
+    """Таблица из 0018 с одним столбцом; после отката нужен
+    rebuild_search_index."""
+    if not has_fts(schema_editor):
+        return
+    schema_editor.execute('DROP TABLE posts_post_fts')
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE posts_post_fts USING fts5(body)'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='search_tokens',
+            field=posts.analysis.SearchTokensField(blank=True, default='', editable=False, source='text', verbose_name='Основы слов для поиска'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='search_tokens',
+            field=posts.analysis.SearchTokensField(blank=True, default='', editable=False, source='text', verbose_name='Основы слов для поиска'),
+        ),
+        migrations.RunPython(analyze_texts, migrations.RunPython.noop),
+        migrations.RunPython(recreate_fts, restore_fts),
+    ]
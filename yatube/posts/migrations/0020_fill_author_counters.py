@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count
+
+
+BATCH_SIZE = 1000
+
+
+def fill_counters(apps, schema_editor):
+    """Счётчики всех авторов, как в rebuild_post_counters.
+
+    Без них счётчики создавались бы при чтении, и посты, добавленные
+    в это время, терялись.
+    """
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    AuthorCounter = apps.get_model('posts', 'AuthorCounter')
+    AuthorCounter.objects.all().delete()
+    authors = User.objects.annotate(
+        posts_count=Count('name')
+    ).values_list('pk', 'posts_count').iterator()
+    AuthorCounter.objects.bulk_create(
+        (
+            AuthorCounter(author_id=pk, posts_count=posts_count)
+            for pk, posts_count in authors
+        ),
+        batch_size=BATCH_SIZE,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0019_search_tokens'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
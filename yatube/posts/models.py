@@ -1,6 +1,10 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 from core.models import CreatedModel
+from core.storage import ContentHashStorage
+
+from .analysis import SearchTokensField
+from .uploads import normalize_image
 
 
 User = get_user_model()
@@ -25,13 +29,26 @@ class Group(models.Model):
         verbose_name_plural = "Группы"
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Посты со всем, что выводит карточка поста в лентах."""
+        return self.select_related('author', 'group')
+
+
+class CommentQuerySet(models.QuerySet):
+    def for_thread(self):
+        """Комментарии с авторами для ленты обсуждения поста."""
+        return self.select_related('author')
+
+
 class Post(CreatedModel):
     text = models.TextField(verbose_name='Текст поста')
     author = models.ForeignKey(
         User,
         verbose_name='Автор',
         on_delete=models.CASCADE,
-        related_name='name'
+        related_name='name',
+        db_index=False
     )
     group = models.ForeignKey(
         Group,
@@ -40,21 +57,68 @@ class Post(CreatedModel):
         blank=True,
         null=True,
         related_name='post',
+        db_index=False,
         help_text='Group to which this message belongs to',
     )
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentHashStorage(),
         blank=True
     )
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки',
+        null=True,
+        editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        'Высота картинки',
+        null=True,
+        editable=False
+    )
+    edit_date = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
+    search_tokens = SearchTokensField(
+        'Основы слов для поиска',
+        source='text'
+    )
+
+    objects = PostQuerySet.as_manager()
 
     def __str__(self) -> str:
         return self.text[:15]
 
+    def save(self, *args, **kwargs):
+        # Новая картинка ещё не в хранилище: сохраняем её уже обработанной.
+        if self.image and not self.image._committed:
+            self.image, self.image_width, self.image_height = (
+                normalize_image(self.image)
+            )
+        elif not self.image:
+            self.image_width = self.image_height = None
+        super().save(*args, **kwargs)
+
     class Meta:
         ordering = ['-pub_date']
         verbose_name = "Пост"
         verbose_name_plural = "Посты"
+        # Под порядок ленты ('-pub_date', '-pk'); индексы с группой
+        # и автором заменяют одиночные индексы внешних ключей.
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='post_feed_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_feed_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_feed_idx'
+            ),
+        ]
 
 
 class Comment(CreatedModel):
@@ -62,7 +126,8 @@ class Comment(CreatedModel):
         Post,
         verbose_name='Пост',
         on_delete=models.CASCADE,
-        related_name='comments'
+        related_name='comments',
+        db_index=False
     )
     author = models.ForeignKey(
         User,
@@ -71,6 +136,12 @@ class Comment(CreatedModel):
         related_name='comments'
     )
     text = models.TextField(verbose_name='Текст комментария')
+    search_tokens = SearchTokensField(
+        'Основы слов для поиска',
+        source='text'
+    )
+
+    objects = CommentQuerySet.as_manager()
 
     def __str__(self) -> str:
         return self.text[:15]
@@ -79,6 +150,11 @@ class Comment(CreatedModel):
         ordering = ['-pub_date']
         verbose_name = "Комментарий"
         verbose_name_plural = "Комментарии"
+        indexes = [
+            models.Index(
+                fields=['post', '-pub_date'], name='comment_thread_idx'
+            ),
+        ]
 
 
 class Follow(models.Model):
@@ -103,3 +179,56 @@ class Follow(models.Model):
                 fields=('user', 'author'), name='unique follow'
             )
         ]
+
+
+class AuthorCounter(models.Model):
+    """Сохранённое число постов автора."""
+    author = models.OneToOneField(
+        User,
+        verbose_name='Автор',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='post_counter'
+    )
+    posts_count = models.PositiveIntegerField(
+        verbose_name='Всего постов',
+        default=0
+    )
+
+    def __str__(self) -> str:
+        return f'{self.author}: {self.posts_count}'
+
+    class Meta:
+        verbose_name = "Счётчик постов"
+        verbose_name_plural = "Счётчики постов"
+
+
+class PostTerm(models.Model):
+    """Слово поста для поиска там, где нет SQLite FTS5."""
+    post = models.ForeignKey(
+        Post,
+        verbose_name='Пост',
+        on_delete=models.CASCADE,
+        related_name='terms',
+        db_index=False
+    )
+    term = models.CharField(
+        verbose_name='Слово',
+        max_length=64
+    )
+    count = models.PositiveIntegerField(verbose_name='Вхождений')
+
+    def __str__(self) -> str:
+        return f'{self.term}: {self.post_id}'
+
+    class Meta:
+        verbose_name = "Слово поста"
+        verbose_name_plural = "Слова постов"
+        constraints = [
+            models.UniqueConstraint(
+                fields=('post', 'term'), name='unique post term'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['term'], name='post_term_idx'),
+        ]
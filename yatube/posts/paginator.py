@@ -0,0 +1,167 @@
+import base64
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from . import counters
+
+
+NEXT = 'next'
+PREVIOUS = 'prev'
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(post, number, direction):
+    """Упаковывает позицию поста в ленте в непрозрачный токен."""
+    payload = json.dumps({
+        'd': post.pub_date.isoformat(),
+        'i': post.pk,
+        'n': number,
+        'r': direction,
+    }, separators=(',', ':'))
+    token = base64.urlsafe_b64encode(payload.encode())
+    return token.decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Распаковывает токен, созданный encode_cursor."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        pub_date = parse_datetime(payload['d'])
+        pk = int(payload['i'])
+        number = int(payload['n'])
+        direction = payload['r']
+    except (ValueError, TypeError, KeyError, AttributeError):
+        raise InvalidCursor(token)
+    if pub_date is None or number < 1 or direction not in (NEXT, PREVIOUS):
+        raise InvalidCursor(token)
+    return pub_date, pk, number, direction
+
+
+class KeysetPaginator(Paginator):
+    """Пагинатор ленты по ключу (pub_date, id).
+
+    Переход по ссылкам «Следующая»/«Предыдущая» идёт по курсору
+    и не использует OFFSET, поэтому не зависит от глубины страницы;
+    последняя страница читается с конца ленты, тоже без OFFSET.
+    Номер страницы (?page=) поддерживается для прямых переходов.
+    Если передан count_key, число постов берётся из кеша счётчиков,
+    если page_key — id постов каждой страницы кешируются под этим
+    префиксом, а сами посты потом выбираются по первичному ключу.
+    """
+    ordering = ('-pub_date', '-pk')
+
+    def __init__(self, object_list, per_page, count_key=None, page_key=None,
+                 **kwargs):
+        super().__init__(
+            object_list.order_by(*self.ordering), per_page, **kwargs
+        )
+        self.count_key = count_key
+        self.page_key = page_key
+
+    @cached_property
+    def count(self):
+        if self.count_key is None:
+            return super().count
+        return counters.get_count(self.count_key, self.object_list)
+
+    def get_page(self, number=None, cursor=None):
+        if cursor:
+            try:
+                return self.cursor_page(cursor)
+            except InvalidCursor:
+                pass
+        return super().get_page(number)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        fetch = self._number_posts
+        if number > 1 and number == self.num_pages:
+            fetch = self._last_posts
+        object_list = self._cached_posts(
+            f'page:{number}', lambda: fetch(number)
+        )
+        return self._with_cursors(Page(object_list, number, self))
+
+    def cursor_page(self, token):
+        pub_date, pk, number, direction = decode_cursor(token)
+        # Ключ — по разобранной позиции: в токене могут быть лишние
+        # символы, и его длина не ограничена.
+        position = hashlib.md5(
+            f'{pub_date.isoformat()}:{pk}'.encode()
+        ).hexdigest()
+        object_list = self._cached_posts(
+            f'cursor:{direction}:{position}',
+            lambda: self._cursor_posts(pub_date, pk, direction)
+        )
+        if not object_list:
+            raise InvalidCursor(token)
+        return self._with_cursors(Page(object_list, number, self))
+
+    def _number_posts(self, number):
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        if top + self.orphans >= self.count:
+            top = self.count
+        return list(self.object_list[bottom:top])
+
+    def _last_posts(self, number):
+        """Последняя страница с конца ленты, без OFFSET."""
+        size = self.count - (number - 1) * self.per_page
+        object_list = list(self.object_list.reverse()[:size])
+        object_list.reverse()
+        return object_list
+
+    def _cursor_posts(self, pub_date, pk, direction):
+        if direction == NEXT:
+            posts = self.object_list.filter(
+                Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk)
+            )
+        else:
+            posts = self.object_list.filter(
+                Q(pub_date__gt=pub_date) | Q(pub_date=pub_date, pk__gt=pk)
+            ).reverse()
+        object_list = list(posts[:self.per_page])
+        if direction == PREVIOUS:
+            object_list.reverse()
+        return object_list
+
+    def _cached_posts(self, part, fetch):
+        if self.page_key is None:
+            return fetch()
+        key = f'{self.page_key}:{part}'
+        ids = cache.get(key)
+        if ids is not None:
+            posts = self.object_list.in_bulk(ids)
+            if len(posts) == len(ids):
+                return [posts[pk] for pk in ids]
+        object_list = fetch()
+        cache.set(
+            key, [post.pk for post in object_list],
+            settings.POSTS_PAGE_TIMEOUT
+        )
+        return object_list
+
+    def _with_cursors(self, page):
+        page.next_cursor = None
+        page.previous_cursor = None
+        object_list = page.object_list
+        if object_list and page.has_next():
+            page.next_cursor = encode_cursor(
+                object_list[-1], page.number + 1, NEXT
+            )
+        if object_list and page.has_previous():
+            page.previous_cursor = encode_cursor(
+                object_list[0], page.number - 1, PREVIOUS
+            )
+        return page
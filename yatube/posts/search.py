@@ -0,0 +1,308 @@
+import math
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections, router, transaction
+from django.db.models import F
+
+from . import counters, dumps
+from .analysis import analyze
+from .models import Comment, Post, PostTerm
+
+
+FTS_TABLE = 'posts_post_fts'
+BATCH_SIZE = 1000
+
+_fts5 = {}
+
+
+def has_fts5(alias):
+    """Есть ли в базе таблица FTS5; ответ запоминается на процесс."""
+    if alias not in _fts5:
+        connection = connections[alias]
+        found = False
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE name = %s",
+                    [FTS_TABLE]
+                )
+                found = cursor.fetchone() is not None
+        _fts5[alias] = found
+    return _fts5[alias]
+
+
+def comment_tokens(alias, post_ids):
+    """Сохранённые основы комментариев, склеенные по постам."""
+    grouped = defaultdict(list)
+    comments = Comment.objects.using(alias).order_by()
+    if post_ids is not None:
+        comments = comments.filter(post_id__in=post_ids)
+    for post_id, tokens in comments.values_list(
+        'post_id', 'search_tokens'
+    ).iterator():
+        grouped[post_id].append(tokens)
+    return {post_id: ' '.join(tokens) for post_id, tokens in grouped.items()}
+
+
+def documents(alias):
+    """Тройки (id, основы поста, основы комментариев) для индекса.
+
+    Берутся готовые основы из search_tokens, тексты заново не
+    разбираются.
+    """
+    comments = comment_tokens(alias, None)
+    posts = Post.objects.using(alias).order_by().values_list(
+        'pk', 'search_tokens'
+    )
+    for pk, tokens in posts.iterator():
+        yield pk, tokens, comments.get(pk, '')
+
+
+class Fts5Index:
+    """Поиск по виртуальной таблице SQLite FTS5, ранжирование bm25.
+
+    Столбцы — основы слов поста и его комментариев; вес столбцов
+    задан в миграции через настройку rank.
+    """
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    def execute(self, sql, params=()):
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def update(self, sql, params):
+        """Число изменённых строк индекса."""
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.rowcount
+
+    def ranked_ids(self, terms, limit):
+        match = ' '.join(f'"{term}"' for term in terms)
+        return [row[0] for row in self.execute(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+            f'ORDER BY rank LIMIT %s', [match, limit]
+        )]
+
+    def insert(self, rows):
+        """Записывает строки индекса, заменяя прежние с теми же id.
+
+        Замена — одна инструкция: удаление и вставка отдельными
+        запросами при параллельных обновлениях поста вставляли rowid
+        дважды, а в явной транзакции SQLite не дожидается записи в FTS5.
+        """
+        with connections[self.alias].cursor() as cursor:
+            cursor.executemany(
+                f'INSERT OR REPLACE INTO {FTS_TABLE}(rowid, body, comments) '
+                f'VALUES (%s, %s, %s)', rows
+            )
+
+    def add(self, pk, body, comments):
+        self.insert([(pk, body, comments)])
+
+    def change_body(self, pk, old, body):
+        if not self.update(
+            f'UPDATE {FTS_TABLE} SET body = %s WHERE rowid = %s', [body, pk]
+        ):
+            self.add(pk, body, comment_tokens(self.alias, [pk]).get(pk, ''))
+
+    def add_comment(self, pk, tokens):
+        self.update(
+            f"UPDATE {FTS_TABLE} SET comments = trim(comments || ' ' || %s) "
+            f"WHERE rowid = %s", [tokens, pk]
+        )
+
+    def remove(self, ids):
+        for pk in ids:
+            self.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [pk])
+
+    def rebuild(self):
+        self.execute(f'DELETE FROM {FTS_TABLE}')
+        for batch in dumps.batched(documents(self.alias), BATCH_SIZE):
+            self.insert(batch)
+
+
+class InvertedIndex:
+    """Обратный индекс в таблице PostTerm, ранжирование tf-idf в Python.
+
+    Запасной путь для баз без FTS5: посты со всеми словами запроса
+    ищутся по индексу слов, вес слова — (1 + log tf) · log(1 + N / df).
+    """
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    def ranked_ids(self, terms, limit):
+        postings = defaultdict(dict)
+        for term, post_id, count in PostTerm.objects.using(
+            self.alias
+        ).filter(term__in=terms).values_list('term', 'post_id', 'count'):
+            postings[term][post_id] = count
+        if len(postings) < len(set(terms)):
+            return []
+        total = counters.get_count(
+            counters.count_key(counters.ALL), Post.objects.using(self.alias)
+        )
+        matches = set.intersection(*map(set, postings.values()))
+        scores = Counter()
+        for posts in postings.values():
+            idf = math.log(1 + total / len(posts))
+            for post_id in matches:
+                scores[post_id] += (1 + math.log(posts[post_id])) * idf
+        return [
+            post_id for post_id, _ in sorted(
+                scores.items(), key=lambda item: (-item[1], -item[0])
+            )[:limit]
+        ]
+
+    def terms(self, pk, body, comments):
+        counts = Counter(body.split()) + Counter(comments.split())
+        return [
+            PostTerm(post_id=pk, term=term, count=count)
+            for term, count in counts.items()
+        ]
+
+    @contextmanager
+    def locked(self, pk):
+        """Транзакция, в которой слова поста меняет только один запрос.
+
+        Строка поста блокируется там, где есть SELECT FOR UPDATE;
+        SQLite и так допускает одного пишущего. Чтения до записи
+        в транзакции SQLite нет: она не смогла бы перейти к записи.
+        """
+        atomic = transaction.atomic(using=self.alias)
+        if connections[self.alias].features.has_select_for_update:
+            with atomic:
+                list(Post.objects.using(self.alias).select_for_update(
+                ).filter(pk=pk).values_list('pk'))
+                yield
+        else:
+            with atomic:
+                yield
+
+    def add(self, pk, body, comments):
+        with self.locked(pk):
+            self.remove([pk])
+            PostTerm.objects.using(self.alias).bulk_create(
+                self.terms(pk, body, comments)
+            )
+
+    def shift(self, pk, counts):
+        """Сдвигает числа вхождений слов поста на counts."""
+        with self.locked(pk):
+            missing = []
+            for term, delta in counts.items():
+                terms = PostTerm.objects.using(self.alias).filter(
+                    post_id=pk, term=term
+                )
+                if delta < 0:
+                    terms.filter(count__lte=-delta).delete()
+                if not terms.update(count=F('count') + delta) and delta > 0:
+                    missing.append(
+                        PostTerm(post_id=pk, term=term, count=delta)
+                    )
+            PostTerm.objects.using(self.alias).bulk_create(missing)
+
+    def change_body(self, pk, old, body):
+        counts = Counter(body.split())
+        counts.subtract(old.split())
+        self.shift(pk, {
+            term: delta for term, delta in counts.items() if delta
+        })
+
+    def add_comment(self, pk, tokens):
+        self.shift(pk, Counter(tokens.split()))
+
+    def remove(self, ids):
+        PostTerm.objects.using(self.alias).filter(post_id__in=ids).delete()
+
+    def rebuild(self):
+        PostTerm.objects.using(self.alias).all().delete()
+        for batch in dumps.batched(documents(self.alias), BATCH_SIZE):
+            PostTerm.objects.using(self.alias).bulk_create([
+                term for document in batch for term in self.terms(*document)
+            ])
+
+
+def get_index(alias):
+    return Fts5Index(alias) if has_fts5(alias) else InvertedIndex(alias)
+
+
+def reading_index():
+    return get_index(router.db_for_read(Post))
+
+
+def writing_index():
+    return get_index(router.db_for_write(Post))
+
+
+def index_post(post, created=False, old_tokens=None):
+    """Обновляет пост в индексе; у нового поста комментариев нет.
+
+    Если известны прежние основы текста, меняется только текст поста,
+    комментарии заново не читаются.
+    """
+    index = writing_index()
+    if created:
+        index.add(post.pk, post.search_tokens, '')
+    elif old_tokens is not None:
+        if old_tokens != post.search_tokens:
+            index.change_body(post.pk, old_tokens, post.search_tokens)
+    else:
+        index.add(post.pk, post.search_tokens, comment_tokens(
+            index.alias, [post.pk]
+        ).get(post.pk, ''))
+
+
+def index_comment(comment):
+    """Добавляет в индекс основы нового комментария, не перечитывая
+    остальные комментарии поста."""
+    if comment.search_tokens:
+        writing_index().add_comment(comment.post_id, comment.search_tokens)
+
+
+def index_comments(post_id):
+    """Заново индексирует все комментарии поста, если пост ещё есть.
+
+    Нужно после удаления или правки комментария.
+    """
+    index = writing_index()
+    body = Post.objects.using(index.alias).filter(pk=post_id).values_list(
+        'search_tokens', flat=True
+    ).first()
+    if body is not None:
+        index.add(post_id, body, comment_tokens(
+            index.alias, [post_id]
+        ).get(post_id, ''))
+
+
+def ranked_ids(query, limit=None):
+    """id постов по убыванию релевантности; все слова обязательны.
+
+    Запрос разбирается так же, как тексты: без стоп-слов, по основам.
+    """
+    terms = analyze(query)
+    if not terms:
+        return []
+    if limit is None:
+        limit = settings.POSTS_SEARCH_MAX_RESULTS
+    return reading_index().ranked_ids(terms, limit)
+
+
+def search_page(query, number, per_page):
+    """Страница найденных постов для шаблона ленты.
+
+    Пагинируются id из индекса, сами посты страницы выбираются
+    одним запросом.
+    """
+    page = Paginator(ranked_ids(query), per_page).get_page(number)
+    posts = Post.objects.for_feed().in_bulk(page.object_list)
+    page.object_list = [
+        posts[pk] for pk in page.object_list if pk in posts
+    ]
+    return page
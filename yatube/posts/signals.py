@@ -0,0 +1,209 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+
+from . import counters, feeds, search, thumbnails, timeline
+from .models import Comment, Follow, Group, Post
+
+
+def follower_ids(author_id):
+    return Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)
+
+
+def post_feeds(username, slug, followers):
+    """Имена лент, в которых показывается пост."""
+    names = [
+        feeds.feed_name(feeds.ALL),
+        feeds.feed_name(feeds.AUTHOR, username),
+    ]
+    if slug is not None:
+        names.append(feeds.feed_name(feeds.GROUP, slug))
+    names.extend(
+        feeds.feed_name(feeds.FOLLOW, user_id) for user_id in followers
+    )
+    return names
+
+
+def bump_after_commit(names):
+    """feeds.bump сейчас и ещё раз после фиксации транзакции.
+
+    Сигналы приходят до фиксации: запрос, прочитавший строки до правки,
+    успел бы закешировать их под уже новой версией. Повторная смена
+    версии после фиксации делает такую копию недоступной.
+    """
+    feeds.bump(names)
+    transaction.on_commit(lambda: feeds.bump(names))
+
+
+@receiver(pre_save, sender=Post)
+def remember_saved_post(sender, instance, raw, **kwargs):
+    if raw or instance.pk is None:
+        return
+    instance._saved = Post.objects.filter(pk=instance.pk).values(
+        'group_id', 'group__slug', 'author_id', 'author__username', 'image',
+        'search_tokens',
+    ).first()
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    saved = getattr(instance, '_saved', None)
+    search.index_post(
+        instance, created, saved['search_tokens'] if saved else None
+    )
+    followers = list(follower_ids(instance.author_id))
+    slug = instance.group.slug if instance.group_id else None
+    names = post_feeds(instance.author.username, slug, followers)
+    names.append(feeds.feed_name(feeds.POST, instance.pk))
+    if created:
+        thumbnails.schedule(instance)
+        counters.shift_author_count(instance.author_id, 1)
+        counters.change_count(
+            counters.post_feed_keys(instance, followers), 1
+        )
+        if settings.POSTS_TIMELINE_ENABLED:
+            timeline.distribute(instance, followers)
+        bump_after_commit(names)
+        return
+    if saved is None:
+        thumbnails.schedule(instance)
+        bump_after_commit(names)
+        return
+    if saved['image'] != instance.image.name:
+        thumbnails.schedule(instance)
+    names.extend(post_feeds(
+        saved['author__username'], saved['group__slug'], ()
+    ))
+    if saved['group_id'] != instance.group_id:
+        counters.forget_count([
+            counters.count_key(counters.GROUP, group_id)
+            for group_id in (saved['group_id'], instance.group_id)
+            if group_id is not None
+        ])
+    if saved['author_id'] != instance.author_id:
+        counters.shift_author_count(saved['author_id'], -1)
+        counters.shift_author_count(instance.author_id, 1)
+        old_followers = list(follower_ids(saved['author_id']))
+        names.extend(post_feeds(
+            saved['author__username'], None, old_followers
+        ))
+        counters.forget_count(
+            [counters.count_key(counters.AUTHOR, author_id)
+             for author_id in (saved['author_id'], instance.author_id)]
+            + [counters.count_key(counters.FOLLOW, user_id)
+               for user_id in old_followers + followers]
+        )
+    bump_after_commit(names)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    search.writing_index().remove([instance.pk])
+    followers = list(follower_ids(instance.author_id))
+    counters.shift_author_count(instance.author_id, -1)
+    keys = counters.post_feed_keys(instance, followers)
+    counters.change_count(keys, -1)
+    if settings.POSTS_TIMELINE_ENABLED:
+        timeline.retract(instance, followers)
+    slug = instance.group.slug if instance.group_id else None
+    names = post_feeds(instance.author.username, slug, followers) + [
+        feeds.feed_name(feeds.POST, instance.pk)
+    ]
+    feeds.bump(names)
+
+    def settle():
+        # Счётчики, пересчитанные до фиксации, ещё видели пост.
+        counters.forget_count(keys)
+        if settings.POSTS_TIMELINE_ENABLED:
+            timeline.retract(instance, followers)
+        feeds.bump(names)
+    transaction.on_commit(settle)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_changed(sender, instance, raw=False, created=False, **kwargs):
+    if raw:
+        return
+    if created:
+        search.index_comment(instance)
+    else:
+        search.index_comments(instance.post_id)
+    feeds.bump([feeds.feed_name(feeds.POST, instance.post_id)])
+
+
+@receiver(pre_save, sender=Group)
+def remember_saved_group(sender, instance, raw, **kwargs):
+    if raw or instance.pk is None:
+        return
+    instance._saved_slug = Group.objects.filter(
+        pk=instance.pk
+    ).values_list('slug', flat=True).first()
+
+
+def group_authors(group):
+    return list(Post.objects.filter(group_id=group.pk).values_list(
+        'author__username', flat=True
+    ).distinct())
+
+
+@receiver(pre_delete, sender=Group)
+def remember_group_authors(sender, instance, **kwargs):
+    instance._usernames = group_authors(instance)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, raw=False, **kwargs):
+    """Название и адрес группы выводятся во всех лентах с её постами."""
+    if raw:
+        return
+    usernames = getattr(instance, '_usernames', None)
+    if usernames is None:
+        usernames = group_authors(instance)
+    names = [
+        feeds.feed_name(feeds.ALL),
+        feeds.feed_name(feeds.GROUP, instance.slug),
+    ]
+    saved_slug = getattr(instance, '_saved_slug', None)
+    if saved_slug is not None:
+        names.append(feeds.feed_name(feeds.GROUP, saved_slug))
+    names.extend(
+        feeds.feed_name(feeds.AUTHOR, username) for username in usernames
+    )
+    feeds.bump(names)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    counters.forget_count(
+        [counters.count_key(counters.FOLLOW, instance.user_id)]
+    )
+    if created and settings.POSTS_TIMELINE_ENABLED:
+        timeline.backfill(instance.user_id, instance.author_id)
+    feeds.bump([
+        feeds.feed_name(feeds.FOLLOW, instance.user_id),
+        feeds.feed_name(feeds.AUTHOR, instance.author.username),
+    ])
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.forget_count(
+        [counters.count_key(counters.FOLLOW, instance.user_id)]
+    )
+    if settings.POSTS_TIMELINE_ENABLED:
+        timeline.prune(instance.user_id, instance.author_id)
+    feeds.bump([
+        feeds.feed_name(feeds.FOLLOW, instance.user_id),
+        feeds.feed_name(feeds.AUTHOR, instance.author.username),
+    ])
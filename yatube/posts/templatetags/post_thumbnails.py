@@ -0,0 +1,47 @@
+from django import template
+from django.template.loader import render_to_string
+
+from posts import thumbnails
+
+
+register = template.Library()
+
+
+def resolve_for(context, post, key, variants):
+    """Миниатюры поста; для постов page_obj — пакетом на всю страницу."""
+    page = context.get('page_obj')
+    if page is None or post not in page.object_list:
+        return thumbnails.resolve_many([post.image], variants)
+    resolved = getattr(page, 'thumbnails', None)
+    if resolved is None:
+        resolved = page.thumbnails = {}
+    if key not in resolved:
+        resolved[key] = thumbnails.resolve_many(
+            [item.image for item in page.object_list], variants
+        )
+    return resolved[key]
+
+
+@register.simple_tag(takes_context=True)
+def post_thumbnail(context, post, variant):
+    """Готовая миниатюра картинки поста или заглушка на время обработки."""
+    if not post.image:
+        return None
+    resolved = resolve_for(context, post, variant, [variant])
+    return resolved[post.image.name, variant]
+
+
+@register.simple_tag(takes_context=True)
+def post_picture(context, post, set_name):
+    """<picture> со srcset и sizes из готовых вариантов набора set_name."""
+    if not post.image:
+        return ''
+    resolved = resolve_for(
+        context, post, set_name, thumbnails.set_variants(set_name)
+    )
+    return render_to_string(
+        'includes/picture.html',
+        thumbnails.picture(
+            resolved, post.image.name, set_name, post.image_width
+        )
+    )
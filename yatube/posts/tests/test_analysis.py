@@ -0,0 +1,30 @@
+from django.test import SimpleTestCase
+from posts.analysis import analyze, stem
+
+
+class AnalysisTest(SimpleTestCase):
+    def test_stem(self):
+        """Основы по алгоритму Snowball для русского."""
+        cases = {
+            'кот': 'кот',
+            'котами': 'кот',
+            'собаки': 'собак',
+            'бегущий': 'бегущ',
+            'умывшись': 'ум',
+            'прекраснейшая': 'прекрасн',
+            'нежность': 'нежност',
+            'стеклянного': 'стекля',
+            'читаете': 'чита',
+            'ночью': 'ноч',
+            'python': 'python',
+        }
+        for word, expected in cases.items():
+            with self.subTest(word=word):
+                self.assertEqual(stem(word), expected)
+
+    def test_analyze(self):
+        """Регистр, «ё» и стоп-слова не попадают в основы."""
+        self.assertEqual(
+            analyze('Ёжик и ЁЛКИ, а ещё — Django 2.2!'),
+            ['ежик', 'елк', 'django', '2', '2'],
+        )
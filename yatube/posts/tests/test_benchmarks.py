@@ -0,0 +1,50 @@
+import io
+import json
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.test import TestCase
+from posts.models import Post
+
+
+VIEWS = {
+    'index', 'group_posts', 'profile', 'post_detail', 'follow_index',
+    'post_create', 'add_comment', 'follow_unfollow',
+}
+
+
+class BenchViewsTest(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'bench.json')
+
+    def bench(self, **options):
+        out = io.StringIO()
+        call_command(
+            'bench_views', sizes=[50], repeat=2, stdout=out, **options
+        )
+        return out.getvalue()
+
+    def test_report(self):
+        """Все view замерены, результаты в JSON, данные откатаны."""
+        self.bench(output=self.path)
+        with open(self.path, encoding='utf-8') as file_:
+            report = json.load(file_)
+        views = report['sizes']['50']
+        self.assertEqual(set(views), VIEWS)
+        cold = views['index']['cold']
+        self.assertGreater(cold['queries'], 0)
+        self.assertGreater(cold['rows'], 0)
+        self.assertGreater(cold['render_ms'], 0)
+        self.assertLessEqual(cold['p50_ms'], cold['p95_ms'])
+        self.assertEqual(views['index']['warm']['queries'], 0)
+        self.assertFalse(Post.objects.exists())
+
+    def test_baseline(self):
+        """С прошлым запуском сравниваются все метрики."""
+        self.bench(output=self.path)
+        out = self.bench(baseline=self.path)
+        self.assertIn('50 post_detail cold: p50_ms', out)
+        self.assertIn('queries =', out)
@@ -0,0 +1,270 @@
+import time
+from unittest import mock
+
+from core.caches import cache_stats, lock_key, reset_cache_stats
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.test import (
+    Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+)
+from django.urls import reverse
+from django.utils.cache import get_cache_key
+from posts import counters, feeds
+from posts.models import Follow, Group, Post
+
+
+User = get_user_model()
+
+
+class FragmentCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='Name')
+        cls.group = Group.objects.create(
+            title='cats', description='Описание', slug='cat'
+        )
+        Post.objects.bulk_create([
+            Post(text='Тестовый текст' + str(i), author=cls.user,
+                 group=cls.group)
+            for i in range(5)
+        ])
+        cls.guest_client = Client()
+        cls.url = reverse('posts:group_list', kwargs={'slug': 'cat'})
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feed_page_is_cached(self):
+        """Повторная страница группы отдаётся из кеша без запросов."""
+        self.guest_client.get(self.url)
+        with self.assertNumQueries(0):
+            self.guest_client.get(self.url)
+
+    def test_browsers_revalidate_feed(self):
+        """Лента хранится на сервере час, а браузер перепроверяет её."""
+        for _ in range(2):
+            response = self.guest_client.get(self.url)
+            self.assertEqual(
+                response['Cache-Control'], 'max-age=0, must-revalidate'
+            )
+
+    def test_fragments_survive_feed_invalidation(self):
+        """После смены версии ленты статьи берутся из кеша фрагментов.
+
+        Запросы: группа и посты страницы.
+        """
+        self.guest_client.get(self.url)
+        feeds.bump([feeds.feed_name(feeds.GROUP, 'cat')])
+        with self.assertNumQueries(2):
+            self.guest_client.get(self.url)
+
+    def test_edit_refreshes_fragment(self):
+        """Изменённый пост рендерится заново."""
+        self.guest_client.get(self.url)
+        post = Post.objects.filter(group=self.group).first()
+        post.text = 'Исправленный текст'
+        post.save()
+        self.assertContains(
+            self.guest_client.get(self.url), 'Исправленный текст'
+        )
+
+
+class PersonalPageTest(TestCase):
+    """Страницы вошедших собираются заново, общими остаются фрагменты."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        cls.fan = User.objects.create(username='fan')
+        cls.other = User.objects.create(username='other')
+        Follow.objects.create(user=cls.fan, author=cls.author)
+        Post.objects.create(text='Пост автора', author=cls.author)
+        cls.url = reverse('posts:profile', kwargs={'username': 'author'})
+
+    def setUp(self):
+        cache.clear()
+
+    def client_for(self, user):
+        client = Client()
+        client.force_login(user)
+        return client
+
+    def test_profile_not_shared_between_users(self):
+        """Второй пользователь не получает страницу первого."""
+        self.assertContains(
+            self.client_for(self.fan).get(self.url), 'Отписаться'
+        )
+        response = self.client_for(self.other).get(self.url)
+        self.assertNotContains(response, 'Отписаться')
+        self.assertNotContains(response, 'Пользователь: fan')
+        self.assertContains(response, 'Пользователь: other')
+        self.assertContains(response, 'Пост автора')
+
+    def test_guest_does_not_get_user_page(self):
+        self.client_for(self.fan).get(self.url)
+        response = Client().get(self.url)
+        self.assertNotContains(response, 'Пользователь: fan')
+
+
+class FeedInvalidationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='Name')
+        cls.follower = User.objects.create(username='Follower')
+        cls.group = Group.objects.create(
+            title='cats', description='Описание', slug='cat'
+        )
+        cls.guest_client = Client()
+
+    def setUp(self):
+        cache.clear()
+
+    def versions(self):
+        return {
+            name: feeds.get_version(*name) for name in (
+                (feeds.ALL,),
+                (feeds.GROUP, 'cat'),
+                (feeds.GROUP, 'dogs'),
+                (feeds.AUTHOR, 'Name'),
+                (feeds.AUTHOR, 'Follower'),
+                (feeds.FOLLOW, self.follower.pk),
+            )
+        }
+
+    def changed(self, before):
+        after = self.versions()
+        return {name for name in before if before[name] != after[name]}
+
+    def test_new_post_shows_up_on_index(self):
+        """Новый пост сразу виден на закешированной главной."""
+        self.guest_client.get(reverse('posts:index'))
+        Post.objects.create(text='Свежий пост', author=self.user)
+        self.assertContains(
+            self.guest_client.get(reverse('posts:index')), 'Свежий пост'
+        )
+
+    def test_post_bumps_its_feeds(self):
+        """Пост меняет версии общей ленты, группы, автора и подписчиков."""
+        Follow.objects.create(user=self.follower, author=self.user)
+        before = self.versions()
+        Post.objects.create(text='Пост', author=self.user, group=self.group)
+        self.assertEqual(self.changed(before), {
+            (feeds.ALL,),
+            (feeds.GROUP, 'cat'),
+            (feeds.AUTHOR, 'Name'),
+            (feeds.FOLLOW, self.follower.pk),
+        })
+
+    def test_follow_bumps_follower_and_author(self):
+        """Подписка меняет ленту подписчика и профиль автора."""
+        before = self.versions()
+        Follow.objects.create(user=self.follower, author=self.user)
+        self.assertEqual(self.changed(before), {
+            (feeds.AUTHOR, 'Name'),
+            (feeds.FOLLOW, self.follower.pk),
+        })
+
+    def test_group_rename_bumps_feeds_with_its_posts(self):
+        """Смена адреса группы меняет её ленты и ленты авторов."""
+        Post.objects.create(text='Пост', author=self.user, group=self.group)
+        before = self.versions()
+        group = Group.objects.get(slug='cat')
+        group.slug = 'dogs'
+        group.save()
+        self.assertEqual(self.changed(before), {
+            (feeds.ALL,),
+            (feeds.GROUP, 'cat'),
+            (feeds.GROUP, 'dogs'),
+            (feeds.AUTHOR, 'Name'),
+        })
+
+
+class DeleteCommitTest(TransactionTestCase):
+    """Удаление внутри транзакции: кеш, заполненный до фиксации."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='Name')
+        self.post = Post.objects.create(text='Текст', author=self.user)
+
+    def test_versions_and_counts_settle_after_commit(self):
+        """Страница и счётчик, собранные между удалением и фиксацией,
+        после фиксации не используются."""
+        key = counters.count_key(counters.ALL)
+        with transaction.atomic():
+            self.user.delete()
+            version = feeds.get_version(feeds.ALL)
+            cache.set(key, 1)
+        self.assertNotEqual(feeds.get_version(feeds.ALL), version)
+        self.assertIsNone(cache.get(key))
+
+
+class StampedeTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='Name')
+        Post.objects.create(text='Тестовый текст', author=cls.user)
+        cls.guest_client = Client()
+        cls.url = reverse('posts:index')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client.get(self.url)
+        self.guest_client.get(self.url)
+        request = RequestFactory().get(self.url)
+        prefix = f'{feeds.ALL}:{feeds.get_version(feeds.ALL)}'
+        self.key = get_cache_key(request, prefix, 'GET', cache=cache)
+        self.lock = lock_key(request, prefix)
+        reset_cache_stats()
+
+    def expire(self):
+        entry = cache.get(self.key)
+        entry['expires'] = time.time() - 1
+        cache.set(self.key, entry)
+
+    def test_fresh_copy_is_a_hit(self):
+        """Свежая копия отдаётся без запросов к базе."""
+        with self.assertNumQueries(0):
+            self.guest_client.get(self.url)
+        self.assertEqual(cache_stats()['hit'], 1)
+
+    def test_stale_copy_while_other_request_recomputes(self):
+        """Пока страницу пересчитывает другой запрос, отдаётся старая."""
+        self.expire()
+        cache.add(self.lock, 1)
+        with self.assertNumQueries(0):
+            self.guest_client.get(self.url)
+        self.assertEqual(cache_stats()['stale'], 1)
+
+    def test_expired_copy_is_recomputed_once(self):
+        """Первый запрос после срока пересчитывает страницу и снимает блок."""
+        self.expire()
+        self.assertContains(self.guest_client.get(self.url), 'Тестовый')
+        self.assertEqual(cache_stats()['refresh'], 1)
+        self.assertIsNone(cache.get(self.lock))
+        self.assertGreater(cache.get(self.key)['expires'], time.time())
+
+    def test_early_expiration(self):
+        """Долгий пересчёт у срока запускается заранее."""
+        entry = cache.get(self.key)
+        entry.update(expires=time.time() + 1, delta=1000)
+        cache.set(self.key, entry)
+        self.guest_client.get(self.url)
+        self.assertEqual(cache_stats()['early'], 1)
+
+    @override_settings(POSTS_FEED_LOCK_WAIT=0.2)
+    def test_miss_waits_for_other_request(self):
+        """При промахе запрос ждёт страницу, которую считает другой."""
+        entry = cache.get(self.key)
+        cache.delete(self.key)
+        cache.add(self.lock, 1)
+        with mock.patch(
+            'core.caches.time.sleep', lambda _: cache.set(self.key, entry)
+        ), self.assertNumQueries(0):
+            self.guest_client.get(self.url)
+        self.assertEqual(cache_stats()['coalesced'], 1)
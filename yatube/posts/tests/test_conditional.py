@@ -0,0 +1,108 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.models import Comment, Group, Post
+
+
+User = get_user_model()
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='Author')
+        cls.reader = User.objects.create(username='Reader')
+        cls.group = Group.objects.create(
+            title='cats', description='Описание', slug='cat'
+        )
+        cls.post = Post.objects.create(
+            text='Текст', author=cls.author, group=cls.group
+        )
+        cls.guest_client = Client()
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.reader)
+        cls.urls = [
+            reverse('posts:group_list', kwargs={'slug': 'cat'}),
+            reverse('posts:profile', kwargs={'username': 'Author'}),
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.pk}),
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_matching_etag_gets_304_without_queries(self):
+        """Совпавший ETag даёт 304 без рендеринга и запросов к базе."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.guest_client.get(url)['ETag']
+                with self.assertNumQueries(0):
+                    response = self.guest_client.get(
+                        url, HTTP_IF_NONE_MATCH=etag
+                    )
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+                self.assertEqual(response.templates, [])
+
+    def test_no_last_modified(self):
+        """Last-Modified не отдаётся: удаление поста не меняет дат правки,
+        и If-Modified-Since вернул бы устаревшую страницу."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertNotIn('Last-Modified', response)
+                response = self.guest_client.get(
+                    url, HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT'
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_delete_invalidates_etag(self):
+        """Удалённый пост пропадает из ленты автора."""
+        url = self.urls[1]
+        post = Post.objects.create(text='Удалить', author=self.author)
+        etag = self.guest_client.get(url)['ETag']
+        post.delete()
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'Удалить')
+
+    def test_changes_invalidate_etag(self):
+        """Новый пост и новый комментарий меняют ETag страниц."""
+        etags = [self.guest_client.get(url)['ETag'] for url in self.urls]
+        Post.objects.create(text='Новый', author=self.author, group=self.group)
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        for url, etag in zip(self.urls, etags):
+            with self.subTest(url=url):
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_viewer(self):
+        """Гость и пользователь видят разную разметку и теги."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertNotEqual(
+                    self.guest_client.get(url)['ETag'],
+                    self.authorized_client.get(url)['ETag'],
+                )
+
+    def test_login_invalidates_post_etag(self):
+        """После нового входа страница поста приходит с новым
+        CSRF-токеном для формы комментария."""
+        url = self.urls[2]
+        client = Client()
+        client.force_login(self.reader)
+        client.get(url)
+        etag = client.get(url)['ETag']
+        self.assertEqual(
+            client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+        client.logout()
+        client.force_login(self.reader)
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'csrfmiddlewaretoken')
@@ -0,0 +1,147 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts import counters
+from posts.models import AuthorCounter, Follow, Group, Post
+
+
+User = get_user_model()
+
+
+class FeedCountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='Name')
+        cls.follower = User.objects.create(username='Follower')
+        cls.group = Group.objects.create(
+            title='cats', description='Описание', slug='cat'
+        )
+        Follow.objects.create(user=cls.follower, author=cls.user)
+        Post.objects.bulk_create([
+            Post(text='Тестовый текст' + str(i), author=cls.user,
+                 group=cls.group)
+            for i in range(12)
+        ])
+        cls.guest_client = Client()
+
+    def setUp(self):
+        cache.clear()
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.guest_client.get(url)
+        return [
+            query for query in queries.captured_queries
+            if 'COUNT(' in query['sql']
+        ]
+
+    def test_page_range_does_not_count_twice(self):
+        """Счётчик ленты считается один раз, дальше берётся из кеша."""
+        url = reverse('posts:group_list', kwargs={'slug': 'cat'})
+        self.assertEqual(len(self.count_queries(url)), 1)
+        self.assertEqual(self.count_queries(url + '?page=2'), [])
+
+    def test_counters_follow_created_and_deleted_posts(self):
+        """Создание и удаление поста сдвигают счётчики его лент."""
+        keys = {
+            counters.count_key(counters.ALL): Post.objects.all(),
+            counters.count_key(counters.GROUP, self.group.pk): (
+                self.group.post.all()
+            ),
+            counters.count_key(counters.AUTHOR, self.user.pk): (
+                self.user.name.all()
+            ),
+            counters.count_key(counters.FOLLOW, self.follower.pk): (
+                Post.objects.filter(author__following__user=self.follower)
+            ),
+        }
+        for key, queryset in keys.items():
+            counters.get_count(key, queryset)
+        post = Post.objects.create(
+            text='Новый пост', author=self.user, group=self.group
+        )
+        for key in keys:
+            with self.subTest(key=key):
+                self.assertEqual(cache.get(key), 13)
+        post.delete()
+        for key in keys:
+            with self.subTest(key=key):
+                self.assertEqual(cache.get(key), 12)
+
+    def test_follow_resets_follower_counter(self):
+        """Подписка сбрасывает счётчик ленты подписчика."""
+        key = counters.count_key(counters.FOLLOW, self.follower.pk)
+        cache.set(key, 100)
+        Follow.objects.filter(user=self.follower).delete()
+        self.assertIsNone(cache.get(key))
+
+
+class AuthorCounterTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='Name')
+        cls.guest_client = Client()
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            text='Тестовый текст', author=self.user
+        )
+
+    def test_post_detail_reads_counter(self):
+        """post_detail показывает счётчик без COUNT по постам."""
+        url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}
+        )
+        self.guest_client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(url)
+        self.assertEqual(response.context['post_cnt'], 1)
+        for query in queries.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'])
+
+    def test_counter_follows_posts(self):
+        """Счётчик меняется при создании и удалении постов."""
+        counters.author_posts_count(self.user)
+        Post.objects.create(text='Ещё пост', author=self.user)
+        self.assertEqual(
+            AuthorCounter.objects.get(author=self.user).posts_count, 2
+        )
+        self.post.delete()
+        self.assertEqual(
+            AuthorCounter.objects.get(author=self.user).posts_count, 1
+        )
+
+    def test_new_post_creates_missing_counter(self):
+        """Пост автора без счётчика создаёт счётчик с верным числом."""
+        AuthorCounter.objects.filter(author=self.user).delete()
+        Post.objects.create(text='Ещё пост', author=self.user)
+        self.assertEqual(
+            AuthorCounter.objects.get(author=self.user).posts_count, 2
+        )
+
+    def test_user_delete_removes_counter(self):
+        """Удаление автора каскадом удаляет посты и счётчик."""
+        user = User.objects.create(username='Temp')
+        Post.objects.create(text='Временный пост', author=user)
+        counters.author_posts_count(user)
+        user.delete()
+        self.assertFalse(AuthorCounter.objects.filter(author_id=user.pk))
+
+    def test_rebuild_command(self):
+        """Команда rebuild_post_counters пересчитывает все счётчики."""
+        AuthorCounter.objects.update_or_create(
+            author=self.user, defaults={'posts_count': 100}
+        )
+        call_command('rebuild_post_counters', stdout=StringIO())
+        self.assertEqual(
+            AuthorCounter.objects.get(author=self.user).posts_count, 1
+        )
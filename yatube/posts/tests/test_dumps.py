@@ -0,0 +1,150 @@
+import io
+import json
+import os
+import tempfile
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from posts import dumps, search
+from posts.models import AuthorCounter, Comment, Follow, Group, Post
+
+
+User = get_user_model()
+
+
+class IterRecordsTest(TestCase):
+    RECORDS = [
+        {'model': 'posts.group', 'pk': 1, 'fields': {'title': 'Кошки]'}},
+        {'model': 'posts.group', 'pk': 2, 'fields': {'title': '{, }'}},
+    ]
+
+    def test_json_array_in_small_chunks(self):
+        """Массив dumpdata разбирается по кускам любой длины."""
+        text = ' \n' + json.dumps(self.RECORDS, indent=2, ensure_ascii=False)
+        for chunk_size in (1, 7, 4096):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(list(dumps.iter_records(
+                    io.StringIO(text), chunk_size
+                )), self.RECORDS)
+
+    def test_ndjson(self):
+        text = '\n'.join(json.dumps(record) for record in self.RECORDS)
+        self.assertEqual(
+            list(dumps.iter_records(io.StringIO(text + '\n\n'))),
+            self.RECORDS
+        )
+
+    def test_empty(self):
+        for text in ('', ' \n', '[]', '[ ]'):
+            with self.subTest(text=text):
+                self.assertEqual(list(dumps.iter_records(io.StringIO(text))),
+                                 [])
+
+
+class DumpMixin:
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'dump.ndjson.gz')
+        self.pub_date = datetime(2021, 5, 1, 12, tzinfo=timezone.utc)
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(
+            title='Кошки', slug='cats', description='О кошках'
+        )
+        post = Post.objects.create(
+            text='Пушистые кошки спят', author=author, group=group
+        )
+        Post.objects.filter(pk=post.pk).update(pub_date=self.pub_date)
+        Comment.objects.create(post=post, author=reader, text='Мурлычут')
+        Follow.objects.create(user=reader, author=author)
+
+    def export(self):
+        call_command('export_posts', self.path, stderr=io.StringIO())
+
+    def load(self, path, **options):
+        out = io.StringIO()
+        call_command(
+            'import_posts', path, stdout=out, stderr=io.StringIO(),
+            **options
+        )
+        return out.getvalue()
+
+    def clear(self):
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        cache.clear()
+
+
+class ExportImportTest(DumpMixin, TestCase):
+    def test_round_trip(self):
+        """Выгруженное загружается обратно с датами, счётчиками и поиском."""
+        self.export()
+        self.clear()
+        self.load(self.path, batch_size=1)
+        self.assert_loaded()
+
+    def assert_loaded(self):
+        post = Post.objects.get()
+        self.assertEqual(post.pub_date, self.pub_date)
+        self.assertEqual(post.group.slug, 'cats')
+        self.assertEqual(post.comments.get().author.username, 'reader')
+        self.assertTrue(
+            Follow.objects.filter(user__username='reader').exists()
+        )
+        self.assertEqual(
+            AuthorCounter.objects.get(author=post.author).posts_count, 1
+        )
+        self.assertEqual(search.ranked_ids('кошка', 10), [post.pk])
+        self.assertEqual(search.ranked_ids('мурлычут', 10), [post.pk])
+
+    def test_sequences_continue_after_import(self):
+        """Новые строки получают id после загруженных."""
+        self.export()
+        loaded = Post.objects.get().pk
+        self.clear()
+        self.load(self.path)
+        new = Post.objects.create(
+            text='Новый пост', author=User.objects.get(username='author')
+        )
+        self.assertGreater(new.pk, loaded)
+
+    def test_ignore_conflicts(self):
+        """Повторная загрузка поверх тех же данных ничего не дублирует."""
+        self.export()
+        self.load(self.path, ignore_conflicts=True)
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertEqual(Follow.objects.count(), 1)
+
+    def test_dumpdata_fixture(self):
+        """Дамп проекта загружается без contenttypes, сессий и прав."""
+        self.clear()
+        report = self.load(os.path.join(settings.BASE_DIR, 'dump.json'))
+        self.assertIn('Пропущено записей других моделей', report)
+        self.assertEqual(Post.objects.count(), 40)
+        self.assertFalse(Post.objects.filter(edit_date__isnull=True).exists())
+        self.assertEqual(
+            sum(AuthorCounter.objects.values_list('posts_count', flat=True)),
+            40
+        )
+
+
+class DeferredIndexesTest(DumpMixin, TransactionTestCase):
+    """Индексы снимаются вне транзакции, нужен настоящий коммит."""
+
+    def test_indexes_rebuilt(self):
+        self.export()
+        self.clear()
+        self.load(self.path, defer_indexes=True)
+        ExportImportTest.assert_loaded(self)
+        with connection.cursor() as cursor:
+            indexes = connection.introspection.get_constraints(
+                cursor, Post._meta.db_table
+            )
+        self.assertIn('post_feed_idx', indexes)
@@ -0,0 +1,96 @@
+import io
+import shutil
+import tempfile
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from posts import search
+from posts.models import AuthorCounter, Comment, Follow, Group, Post
+
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class GenerateDataTest(TestCase):
+    OPTIONS = {
+        'users': 40, 'groups': 3, 'posts': 300, 'comments': 400,
+        'follows': 5, 'batch_size': 64,
+    }
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def generate(self, prefix, **options):
+        call_command(
+            'generate_data', prefix=prefix, stdout=io.StringIO(),
+            **{**self.OPTIONS, **options}
+        )
+        users = User.objects.filter(username__startswith=prefix)
+        return {
+            'posts': list(Post.objects.filter(
+                author__in=users
+            ).order_by('pk').values_list(
+                'author__username', 'group__title', 'text', 'pub_date'
+            )),
+            'follows': sorted(Follow.objects.filter(
+                user__in=users
+            ).values_list('user__username', 'author__username')),
+            'comments': Comment.objects.filter(author__in=users).count(),
+        }
+
+    def test_sizes(self):
+        """Создаётся ровно заказанное, счётчики и поиск готовы."""
+        data = self.generate('a', images=0.5, image_pool=2)
+        self.assertEqual(len(data['posts']), 300)
+        self.assertEqual(data['comments'], 400)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(
+            sum(AuthorCounter.objects.values_list('posts_count', flat=True)),
+            300
+        )
+        with_images = Post.objects.exclude(image='')
+        self.assertTrue(0 < with_images.count() < 300)
+        self.assertLessEqual(
+            with_images.values('image').distinct().count(), 2
+        )
+        self.assertFalse(with_images.filter(image_width=None).exists())
+        word = data['posts'][0][2].split()[0].rstrip('.')
+        self.assertTrue(search.ranked_ids(word, 5))
+
+    def test_long_tails(self):
+        """Подписчики и комментарии сосредоточены у немногих."""
+        data = self.generate('a')
+        followers = Counter(author for _, author in data['follows'])
+        self.assertGreater(followers['a0'], 3 * followers['a20'])
+        per_post = Counter(Comment.objects.values_list('post', flat=True))
+        self.assertGreater(max(per_post.values()), 40)
+        self.assertLess(len(per_post), 300)
+
+    def test_seed_reproducible(self):
+        """Один seed даёт тот же набор, другой — иной."""
+        def normalized(prefix, **options):
+            data = self.generate(prefix, **options)
+            strip = len(prefix)
+            data['posts'] = [
+                (author[strip:], *rest) for author, *rest in data['posts']
+            ]
+            data['follows'] = [
+                (user[strip:], author[strip:])
+                for user, author in data['follows']
+            ]
+            return data
+
+        first = normalized('a', seed=7)
+        self.assertEqual(normalized('b', seed=7), first)
+        self.assertNotEqual(normalized('c', seed=8)['posts'], first['posts'])
+
+    def test_prefix_taken(self):
+        User.objects.create(username='a1')
+        with self.assertRaises(CommandError):
+            self.generate('a')
@@ -0,0 +1,113 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.models import Post
+from posts.paginator import KeysetPaginator
+
+
+User = get_user_model()
+
+
+class KeysetPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='Name')
+        Post.objects.bulk_create([
+            Post(text='Тестовый текст' + str(i), author=cls.user)
+            for i in range(25)
+        ])
+        cls.guest_client = Client()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cursor_pages_match_numbered_pages(self):
+        """Переход по курсорам даёт те же страницы, что и по номерам."""
+        paginator = KeysetPaginator(Post.objects.all(), 10)
+        page = paginator.get_page(1)
+        numbers = [1]
+        while page.next_cursor:
+            expected = list(paginator.page(page.number + 1))
+            page = paginator.get_page(cursor=page.next_cursor)
+            numbers.append(page.number)
+            self.assertEqual(list(page), expected)
+        self.assertEqual(numbers, [1, 2, 3])
+        previous = paginator.get_page(cursor=page.previous_cursor)
+        self.assertEqual(previous.number, 2)
+        self.assertEqual(list(previous), list(paginator.page(2)))
+
+    def test_cursor_page_has_no_offset(self):
+        """Страница по курсору запрашивается без OFFSET."""
+        paginator = KeysetPaginator(Post.objects.all(), 10)
+        cursor = paginator.get_page(2).next_cursor
+        with CaptureQueriesContext(connection) as queries:
+            list(paginator.get_page(cursor=cursor))
+        self.assertTrue(queries.captured_queries)
+        for query in queries.captured_queries:
+            self.assertNotIn('OFFSET', query['sql'])
+
+    def test_last_page_has_no_offset(self):
+        """Последняя страница читается с конца ленты и совпадает
+        с последним срезом."""
+        paginator = KeysetPaginator(Post.objects.all(), 10)
+        expected = list(Post.objects.order_by('-pub_date', '-pk')[20:])
+        with CaptureQueriesContext(connection) as queries:
+            page = paginator.get_page(3)
+        self.assertEqual(list(page), expected)
+        for query in queries.captured_queries:
+            self.assertNotIn('OFFSET', query['sql'])
+        self.assertEqual(
+            list(paginator.get_page(cursor=page.previous_cursor)),
+            list(paginator.page(2))
+        )
+
+    def test_page_links_are_a_window(self):
+        """Ссылок на номера страниц не больше пяти вокруг текущей."""
+        Post.objects.bulk_create([
+            Post(text='Ещё текст' + str(i), author=self.user)
+            for i in range(100)
+        ])
+        response = self.guest_client.get(
+            reverse('posts:index'), {'page': 6}
+        )
+        links = [
+            number for number in range(1, 14)
+            if f'page={number}">{number}<' in response.content.decode()
+        ]
+        self.assertEqual(links, [4, 5, 7, 8])
+        self.assertContains(response, '<span class="page-link">6</span>')
+        self.assertContains(response, 'page=13')
+
+    def test_cursor_cache_key_is_bounded(self):
+        """Курсор с мусором в ключ кеша не попадает."""
+        paginator = KeysetPaginator(
+            Post.objects.all(), 10, page_key='posts:page:test'
+        )
+        cursor = paginator.get_page(1).next_cursor
+        padded = cursor + '!' * 400
+        with mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+            page = paginator.get_page(cursor=padded)
+        self.assertEqual(page.number, 2)
+        self.assertEqual(list(page), list(paginator.get_page(2)))
+        key = cache_set.call_args[0][0]
+        self.assertNotIn(cursor, key)
+        self.assertLess(len(key), 250)
+
+    def test_invalid_cursor_returns_first_page(self):
+        """Испорченный курсор не ломает ленту."""
+        response = self.guest_client.get(
+            reverse('posts:index') + '?cursor=broken'
+        )
+        self.assertEqual(response.context['page_obj'].number, 1)
+
+    def test_index_renders_cursor_links(self):
+        """Ссылка «Следующая» на главной ведёт по курсору."""
+        response = self.guest_client.get(reverse('posts:index'))
+        page_obj = response.context['page_obj']
+        self.assertContains(response, '?cursor=' + page_obj.next_cursor)
@@ -0,0 +1,83 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.models import Comment, Follow, Group, Post
+
+
+User = get_user_model()
+
+
+class QueryBudgetMixin:
+    """Проверка, что страница укладывается в бюджет запросов к базе."""
+
+    def assertMaxQueries(self, budget, client, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(
+            len(queries), budget, '\n'.join(
+                query['sql'] for query in queries.captured_queries
+            )
+        )
+        return response
+
+
+class QueryBudgetTest(QueryBudgetMixin, TestCase):
+    """Число запросов не растёт с числом постов и комментариев."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(
+            title='cats', description='Описание', slug='cat'
+        )
+        cls.reader = User.objects.create(username='Reader')
+        authors = [
+            User.objects.create(username=f'Author{i}') for i in range(10)
+        ]
+        for author in authors:
+            Follow.objects.create(user=cls.reader, author=author)
+        cls.post = None
+        for i, author in enumerate(authors):
+            cls.post = Post.objects.create(
+                text=f'Текст {i}', author=author, group=cls.group
+            )
+        for author in authors:
+            Comment.objects.create(
+                post=cls.post, author=author, text='Комментарий'
+            )
+        cls.guest_client = Client()
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.reader)
+
+    def test_feed_pages(self):
+        """Ленты: число постов, id страницы и сами посты с авторами;
+        у групп и авторов ещё сама группа или автор."""
+        pages = {
+            reverse('posts:index'): 2,
+            reverse('posts:group_list', kwargs={'slug': 'cat'}): 3,
+            reverse('posts:profile', kwargs={'username': 'Author0'}): 3,
+        }
+        for url, budget in pages.items():
+            with self.subTest(url=url):
+                self.assertMaxQueries(budget, self.guest_client, url)
+
+    def test_follow_page(self):
+        """Лента подписок: плюс сессия и пользователь."""
+        self.assertMaxQueries(
+            4, self.authorized_client, reverse('posts:follow_index')
+        )
+
+    def test_post_detail_with_comments(self):
+        """Пост с автором и счётчиком, комментарии одним запросом,
+        автор поста для ETag — ещё одним."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        self.guest_client.get(url)
+        response = self.assertMaxQueries(
+            3, self.guest_client, url
+        )
+        self.assertEqual(len(response.context['comments']), 10)
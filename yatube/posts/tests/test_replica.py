@@ -0,0 +1,132 @@
+import os
+import tempfile
+
+from core.middleware import COOKIE
+from core.routers import REPLICA
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts.models import Follow, Post
+
+
+User = get_user_model()
+# Гостевые чтения, будто реплика уже догнала все правки.
+replica_caught_up = override_settings(REPLICA_STICKY_TIMEOUT=0)
+
+
+class ReplicaRoutingTest(TestCase):
+    """Реплика — отдельный файл SQLite, в который ничего не реплицируется.
+
+    Поэтому всё, что прочитано с реплики, не видит записей в default.
+    """
+
+    databases = {'default', REPLICA}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.configured = connections.databases.get(REPLICA)
+        cls.drop_replica_connection()
+        connections.databases[REPLICA] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(cls.directory.name, 'replica.sqlite3'),
+        }
+        call_command('migrate', database=REPLICA, verbosity=0)
+        super().setUpClass()
+        cls.user = User.objects.create(username='Name')
+        cls.post = Post.objects.create(text='Пост в основной базе',
+                                       author=cls.user)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.drop_replica_connection()
+        if cls.configured:
+            connections.databases[REPLICA] = cls.configured
+        else:
+            del connections.databases[REPLICA]
+        cls.directory.cleanup()
+
+    @classmethod
+    def drop_replica_connection(cls):
+        if hasattr(connections._connections, REPLICA):
+            connections[REPLICA].close()
+            delattr(connections._connections, REPLICA)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_feeds_read_from_replica(self):
+        """Ленты и страница поста читаются с реплики."""
+        with replica_caught_up:
+            self.assertNotContains(
+                self.guest_client.get(reverse('posts:index')),
+                'Пост в основной базе'
+            )
+        response = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_writes_go_to_primary(self):
+        self.authorized_client.post(
+            reverse('posts:post_create'), {'text': 'Новый пост'}
+        )
+        self.assertTrue(
+            Post.objects.using('default').filter(text='Новый пост').exists()
+        )
+        self.assertFalse(
+            Post.objects.using(REPLICA).filter(text='Новый пост').exists()
+        )
+
+    def test_writer_reads_own_writes(self):
+        """После записи автор какое-то время читает с основной базы."""
+        response = self.authorized_client.post(
+            reverse('posts:post_create'), {'text': 'Новый пост'}
+        )
+        self.assertIn(COOKIE, response.cookies)
+        with replica_caught_up:
+            self.assertNotContains(
+                self.guest_client.get(reverse('posts:index')), 'Новый пост'
+            )
+        cache.clear()
+        self.assertContains(
+            self.authorized_client.get(reverse('posts:index')), 'Новый пост'
+        )
+
+    def test_fresh_version_is_rendered_from_primary(self):
+        """Пока реплика может отставать от правки, лента читается с
+        основной базы, и в кеш под новой версией не попадает старая."""
+        self.authorized_client.post(
+            reverse('posts:post_create'), {'text': 'Новый пост'}
+        )
+        self.assertContains(
+            self.guest_client.get(reverse('posts:index')), 'Новый пост'
+        )
+        with replica_caught_up:
+            self.assertContains(
+                self.guest_client.get(reverse('posts:index')), 'Новый пост'
+            )
+
+    def test_fresh_follow_feed_is_read_from_primary(self):
+        """Ленту подписок, чья версия только что сменилась, списки id и
+        счётчик которой пойдут в кеш, читают с основной базы."""
+        reader = User.objects.create(username='Reader')
+        Follow.objects.create(user=reader, author=self.user)
+        Post.objects.create(text='Пост для подписчика', author=self.user)
+        client = Client()
+        client.force_login(reader)
+        url = reverse('posts:follow_index')
+        self.assertContains(client.get(url), 'Пост для подписчика')
+        with replica_caught_up:
+            response = client.get(url)
+        self.assertEqual(
+            response.context['page_obj'].paginator.count,
+            Post.objects.filter(author=self.user).count()
+        )
@@ -0,0 +1,240 @@
+import os
+import tempfile
+import threading
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.paginator import Page
+from django.db import connection, connections
+from django.test import Client, SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts import search
+from posts.models import Comment, Post
+
+
+User = get_user_model()
+
+
+class SearchMixin:
+    # Индекс и посты страницы; запасному индексу ещё нужно число постов.
+    page_queries = 2
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='Name')
+        self.guest_client = Client()
+        self.posts = {
+            name: Post.objects.create(text=text, author=self.user)
+            for name, text in {
+                'cat': 'Кот сидит на окне',
+                'cats': 'Кот и ещё кот, а кот третий',
+                'dog': 'Собака лает на прохожих',
+                'hedgehog': 'Ёж в тумане',
+            }.items()
+        }
+
+    def found(self, query):
+        return search.ranked_ids(query)
+
+    def test_ranked_by_relevance(self):
+        """Пост, где слово встречается чаще, выше."""
+        self.assertEqual(
+            self.found('кот'), [self.posts['cats'].pk, self.posts['cat'].pk]
+        )
+
+    def test_all_words_required(self):
+        self.assertEqual(self.found('КОТ окне'), [self.posts['cat'].pk])
+        self.assertEqual(self.found('кот собака'), [])
+        self.assertEqual(self.found('  ,.!  '), [])
+
+    def test_inflected_forms(self):
+        """Запрос находит другие формы слова."""
+        self.assertEqual(
+            self.found('котами'),
+            [self.posts['cats'].pk, self.posts['cat'].pk]
+        )
+        self.assertEqual(self.found('окна'), [self.posts['cat'].pk])
+        self.assertEqual(
+            self.found('собаку прохожими'), [self.posts['dog'].pk]
+        )
+
+    def test_stop_words_are_ignored(self):
+        self.assertEqual(self.found('и на'), [])
+        self.assertEqual(self.found('на окне'), [self.posts['cat'].pk])
+
+    def test_comments_are_searched(self):
+        """Пост находится по словам комментариев к нему."""
+        post = self.posts['dog']
+        comment = Comment.objects.create(
+            post=post, author=self.user, text='Чудесные фотографии'
+        )
+        self.assertEqual(self.found('фотография'), [post.pk])
+        post.text = 'Собака спит'
+        post.save()
+        self.assertEqual(self.found('фотографии собака'), [post.pk])
+        comment.delete()
+        self.assertEqual(self.found('фотография'), [])
+
+    def test_new_comment_is_added_incrementally(self):
+        """Новый комментарий не перечитывает остальные комментарии поста,
+        а результат совпадает с перестроенным индексом."""
+        post = self.posts['cat']
+        Comment.objects.create(post=post, author=self.user, text='Кот!')
+        with CaptureQueriesContext(connection) as queries:
+            Comment.objects.create(
+                post=post, author=self.user, text='Кот, кот и кот'
+            )
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if query['sql'].startswith('SELECT')
+            and 'posts_comment' in query['sql']
+        ])
+        post.text = 'Кот сидит на подоконнике'
+        post.save()
+        self.assertEqual(self.found('подоконник'), [post.pk])
+        self.assertEqual(self.found('окне'), [])
+        ranked = self.found('кот')
+        self.assertCountEqual(ranked, [post.pk, self.posts['cats'].pk])
+        call_command('rebuild_search_index', stdout=open(os.devnull, 'w'))
+        self.assertEqual(self.found('кот'), ranked)
+
+    def test_yo_is_folded(self):
+        """«Ё» и «е» в запросе и тексте не различаются."""
+        self.assertEqual(self.found('еж'), [self.posts['hedgehog'].pk])
+
+    def test_edit_and_delete_update_index(self):
+        post = self.posts['dog']
+        post.text = 'Собака спит'
+        post.save()
+        self.assertEqual(post.search_tokens, 'собак спит')
+        self.assertEqual(self.found('лает'), [])
+        self.assertEqual(self.found('спит'), [post.pk])
+        post.delete()
+        self.assertEqual(self.found('собака'), [])
+
+    def test_rebuild_command(self):
+        """Посты из bulk_create находятся после перестройки индекса."""
+        Post.objects.bulk_create([
+            Post(text=f'Массовый пост {i}', author=self.user)
+            for i in range(3)
+        ])
+        self.assertEqual(self.found('массовый'), [])
+        call_command('rebuild_search_index', stdout=open(os.devnull, 'w'))
+        self.assertEqual(len(self.found('массовый')), 3)
+        self.assertEqual(len(self.found('кот')), 2)
+
+    def test_search_page(self):
+        """Страница поиска: лента найденных постов и ссылки с запросом."""
+        Post.objects.bulk_create([
+            Post(text=f'Кот номер {i}', author=self.user) for i in range(12)
+        ])
+        call_command('rebuild_search_index', stdout=open(os.devnull, 'w'))
+        with self.assertNumQueries(self.page_queries):
+            response = self.guest_client.get(
+                reverse('posts:search'), {'q': 'кот'}
+            )
+        page_obj = response.context['page_obj']
+        self.assertIsInstance(page_obj, Page)
+        self.assertEqual(page_obj.paginator.count, 14)
+        self.assertEqual(page_obj[0], self.posts['cats'])
+        self.assertContains(
+            response, 'href="?q=%D0%BA%D0%BE%D1%82&amp;page=2"'
+        )
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': 'кот', 'page': 2}
+        )
+        self.assertEqual(len(response.context['page_obj']), 4)
+
+
+class Fts5SearchTest(SearchMixin, TestCase):
+    def test_uses_fts5(self):
+        self.assertIsInstance(search.reading_index(), search.Fts5Index)
+
+
+class InvertedIndexSearchTest(SearchMixin, TestCase):
+    """Запасной индекс в PostTerm, как на базах без FTS5."""
+
+    page_queries = 3
+
+    def setUp(self):
+        patcher = mock.patch.object(search, 'has_fts5', return_value=False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        super().setUp()
+
+
+class ConcurrentIndexTest(SimpleTestCase):
+    """Параллельные обновления одного поста в индексе FTS5.
+
+    Тестовая база SQLite в памяти не ждёт блокировок, поэтому потоки
+    пишут в отдельный файл, как рабочая база.
+    """
+
+    ALIAS = 'concurrent_search'
+    databases = {ALIAS}
+    THREADS = 8
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        connections.databases[cls.ALIAS] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(cls.directory.name, 'search.sqlite3'),
+        }
+        connections.ensure_defaults(cls.ALIAS)
+        connections.prepare_test_settings(cls.ALIAS)
+        super().setUpClass()
+        with connections[cls.ALIAS].cursor() as cursor:
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE {search.FTS_TABLE} '
+                f'USING fts5(body, comments)'
+            )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[cls.ALIAS].close()
+        del connections.databases[cls.ALIAS]
+        cls.directory.cleanup()
+
+    def run_threads(self, work):
+        errors = []
+        barrier = threading.Barrier(self.THREADS)
+
+        def target(number):
+            try:
+                barrier.wait()
+                for _ in range(10):
+                    work(search.Fts5Index(self.ALIAS), number)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connections[self.ALIAS].close()
+
+        threads = [
+            threading.Thread(target=target, args=(number,))
+            for number in range(self.THREADS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_parallel_rewrites_and_comments(self):
+        """Перезапись поста и новые комментарии не падают и не теряются."""
+        index = search.Fts5Index(self.ALIAS)
+        index.add(1, 'пост', '')
+        self.run_threads(lambda index, number: index.add(1, 'пост', ''))
+        self.run_threads(
+            lambda index, number: index.add_comment(1, f'слово{number}')
+        )
+        self.assertEqual(index.execute(
+            f'SELECT count(*) FROM {search.FTS_TABLE}'
+        ), [(1,)])
+        for number in range(self.THREADS):
+            with self.subTest(number=number):
+                self.assertEqual(index.ranked_ids([f'слово{number}'], 5), [1])
@@ -0,0 +1,122 @@
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts import thumbnails
+from posts.models import Post
+
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+OTHER_GIF = SMALL_GIF.replace(b'\xFF\xFF\xFF', b'\x00\xFF\x00')
+
+
+def upload(name, content=SMALL_GIF):
+    return SimpleUploadedFile(name, content, 'image/gif')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POSTS_THUMBNAILS_ASYNC=True)
+class ContentHashStorageTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='Name')
+        cls.other = User.objects.create(username='Other')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def stored_files(self):
+        directory = os.path.join(TEMP_MEDIA_ROOT, 'posts')
+        return [
+            name for _, _, names in os.walk(directory) for name in names
+        ]
+
+    def test_identical_uploads_share_file(self):
+        """Одинаковые картинки разных авторов хранятся один раз."""
+        first = Post.objects.create(
+            text='Первый', author=self.user, image=upload('cat.gif')
+        )
+        second = Post.objects.create(
+            text='Второй', author=self.other, image=upload('копия.gif')
+        )
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(len(self.stored_files()), 1)
+
+    def test_reupload_on_edit_keeps_name(self):
+        """Повторная загрузка той же картинки при правке не пишет файл."""
+        post = Post.objects.create(
+            text='Пост', author=self.user, image=upload('cat.gif')
+        )
+        client = Client()
+        client.force_login(self.user)
+        client.post(
+            reverse('posts:post_edit', args=[post.pk]),
+            {'text': 'Правка', 'image': upload('again.gif')},
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'Правка')
+        self.assertEqual(len(self.stored_files()), 1)
+
+    def test_identical_uploads_share_thumbnails(self):
+        """Миниатюры картинки готовы и для её копии."""
+        first = Post.objects.create(
+            text='Первый', author=self.user, image=upload('cat.gif')
+        )
+        thumbnails.generate(first.image.name)
+        second = Post.objects.create(
+            text='Второй', author=self.other, image=upload('dog.gif')
+        )
+        image = thumbnails.lookup(second.image, 'card')
+        self.assertFalse(getattr(image, 'pending', False))
+
+    def test_collect_media_removes_orphans(self):
+        """Сборщик удаляет картинки без постов вместе с миниатюрами."""
+        kept = Post.objects.create(
+            text='Пост', author=self.user, image=upload('cat.gif')
+        )
+        orphan = Post.objects.create(
+            text='Удалённый', author=self.user,
+            image=upload('dog.gif', OTHER_GIF),
+        )
+        thumbnails.generate(orphan.image.name)
+        thumbnail = thumbnails.lookup(orphan.image, 'card')
+        name = orphan.image.name
+        orphan.delete()
+        devnull = open(os.devnull, 'w')
+        self.addCleanup(devnull.close)
+        call_command('collect_media', dry_run=True, min_age=0, stdout=devnull)
+        self.assertEqual(len(self.stored_files()), 2)
+        call_command('collect_media', min_age=0, stdout=devnull)
+        self.assertEqual(
+            self.stored_files(), [os.path.basename(kept.image.name)]
+        )
+        self.assertFalse(kept.image.storage.exists(name))
+        self.assertFalse(thumbnail.exists())
+
+    def test_collect_media_spares_fresh_files(self):
+        """Свежие файлы не трогаются: их пост может быть не сохранён."""
+        post = Post.objects.create(
+            text='Пост', author=self.user, image=upload('cat.gif')
+        )
+        post.delete()
+        call_command('collect_media', stdout=open(os.devnull, 'w'))
+        self.assertEqual(len(self.stored_files()), 1)
@@ -0,0 +1,229 @@
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+from posts import thumbnails
+from posts.models import Post
+
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POSTS_THUMBNAILS_ASYNC=True)
+class ThumbnailPipelineTest(TestCase):
+    """В TestCase коммита нет, поэтому очередь воркеров не запускается."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='Name')
+        cls.guest_client = Client()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        shutil.rmtree(self.thumbnail_dir(), ignore_errors=True)
+        self.post = Post.objects.create(
+            text='Пост с картинкой', author=self.user,
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+        )
+
+    def thumbnail_dir(self):
+        return os.path.join(TEMP_MEDIA_ROOT, 'cache')
+
+    def test_page_shows_placeholder_while_pending(self):
+        """Страница не создаёт миниатюры сама, а выводит заглушку."""
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, thumbnails.PLACEHOLDER)
+        self.assertFalse(os.path.exists(self.thumbnail_dir()))
+
+    def test_worker_renders_variant_and_refreshes_feeds(self):
+        """После воркера лента показывает готовую миниатюру."""
+        self.guest_client.get(reverse('posts:index'))
+        thumbnails.render(self.post.pk, self.post.image.name)
+        image = thumbnails.lookup(self.post.image, 'card')
+        self.assertFalse(getattr(image, 'pending', False))
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, image.url)
+        self.assertNotContains(response, thumbnails.PLACEHOLDER)
+
+    def test_command_pregenerates_backlog(self):
+        """Команда готовит миниатюры уже загруженных картинок."""
+        call_command('generate_thumbnails', workers=1, stdout=open(
+            os.devnull, 'w'
+        ))
+        image = thumbnails.lookup(self.post.image, 'card')
+        self.assertTrue(image.exists())
+        self.assertEqual((image.width, image.height), (300, 300))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POSTS_THUMBNAILS_ASYNC=True)
+class BatchLookupTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='Name')
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост {i}', author=cls.user,
+                image=SimpleUploadedFile(
+                    f'small{i}.gif',
+                    SMALL_GIF.replace(
+                        b'\xFF\xFF\xFF', bytes([40 + i * 20] * 3)
+                    ),
+                    'image/gif',
+                ),
+            )
+            for i in range(10)
+        ]
+        for post in cls.posts[:5]:
+            thumbnails.generate(post.image.name)
+        cls.guest_client = Client()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def kvstore_queries(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(reverse('posts:index'))
+        return response, [
+            query for query in queries.captured_queries
+            if 'thumbnail_kvstore' in query['sql']
+        ]
+
+    def test_page_resolves_thumbnails_in_one_query(self):
+        """Миниатюры страницы из 10 постов читаются одним запросом."""
+        response, queries = self.kvstore_queries()
+        self.assertEqual(len(queries), 1)
+        self.assertContains(response, thumbnails.PLACEHOLDER, count=5)
+        self.assertContains(response, '<img src="/media/cache/', count=5)
+
+    def test_miss_does_not_hide_stored_thumbnail(self):
+        """Промах, прочитанный до воркера, не затирает его миниатюру."""
+        image = self.posts[-1].image
+        filter_ = thumbnails.KVStoreModel.objects.filter
+
+        def worker_finishes_after_query(*args, **kwargs):
+            rows = list(filter_(*args, **kwargs).values_list('key', 'value'))
+            thumbnails.generate(image.name)
+            return mock.Mock(**{'values_list.return_value': rows})
+
+        cache.clear()
+        with mock.patch.object(
+            thumbnails.KVStoreModel.objects, 'filter',
+            worker_finishes_after_query,
+        ):
+            self.assertTrue(thumbnails.lookup(image, 'card').pending)
+        self.assertFalse(
+            getattr(thumbnails.lookup(image, 'card'), 'pending', False)
+        )
+
+    def test_resolve_reads_cache_in_one_batch(self):
+        """Повторное чтение обходится одним get_many без базы."""
+        images = [post.image for post in self.posts]
+        thumbnails.resolve(images, 'card')
+        with self.assertNumQueries(0):
+            resolved = thumbnails.resolve(images, 'card')
+        self.assertEqual(len(resolved), 10)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POSTS_THUMBNAILS_ASYNC=False)
+class ResponsiveImageTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='Name')
+        cls.guest_client = Client()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        content = io.BytesIO()
+        Image.new('RGB', (800, 600), 'teal').save(content, 'JPEG')
+        self.post = Post.objects.create(
+            text='Пост с картинкой', author=self.user,
+            image=SimpleUploadedFile(
+                'wide.jpg', content.getvalue(), 'image/jpeg'
+            ),
+        )
+
+    def test_every_width_is_generated(self):
+        """При сохранении готовятся все ширины во всех форматах."""
+        resolved = thumbnails.resolve_many(
+            [self.post.image], thumbnails.set_variants('card')
+        )
+        for (_, variant), image in resolved.items():
+            with self.subTest(variant=variant):
+                self.assertFalse(getattr(image, 'pending', False))
+        self.assertEqual(
+            {image.width for image in resolved.values()}, {150, 300, 600}
+        )
+
+    def test_narrow_source_is_not_upscaled(self):
+        """Варианты шире оригинала не готовятся и не попадают в srcset;
+        остаётся только запасной вариант для <img>."""
+        Post.objects.all().delete()
+        post = Post.objects.create(
+            text='Маленькая картинка', author=self.user,
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+        )
+        resolved = thumbnails.resolve_many(
+            [post.image], thumbnails.set_variants('card')
+        )
+        ready = {
+            variant for (_, variant), image in resolved.items()
+            if not getattr(image, 'pending', False)
+        }
+        self.assertEqual(ready, {'card', 'card-300-jpeg'})
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, resolved[post.image.name, 'card'].url)
+        self.assertNotContains(response, 'srcset')
+
+    def test_page_emits_srcset_and_sizes(self):
+        """Лента отдаёт srcset со всеми ширинами и sizes набора."""
+        response = self.guest_client.get(reverse('posts:index'))
+        content = response.content.decode()
+        for width in thumbnails.IMAGE_SETS['card']['widths']:
+            with self.subTest(width=width):
+                self.assertIn(f' {width}w', content)
+        self.assertIn(
+            f'sizes="{thumbnails.IMAGE_SETS["card"]["sizes"]}"', content
+        )
+
+    @skipUnless('WEBP' in thumbnails.FORMATS, 'Pillow собран без WebP')
+    def test_webp_source(self):
+        """WebP отдаётся через <source> браузерам, которые его понимают."""
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, '<source type="image/webp"')
+        self.assertContains(response, '.webp 150w')
@@ -0,0 +1,190 @@
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.db import connection
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from core.caches import TieredCache, cache_from_url
+from posts import timeline
+from posts.models import Follow, Post
+from posts.paginator import KeysetPaginator
+
+
+User = get_user_model()
+
+
+@override_settings(POSTS_TIMELINE_ENABLED=True, POSTS_TIMELINE_SIZE=15)
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='Name')
+        cls.author = User.objects.create(username='Author')
+        cls.other = User.objects.create(username='Other')
+        Follow.objects.create(user=cls.user, author=cls.author)
+        Post.objects.bulk_create([
+            Post(text='Тестовый текст' + str(i), author=cls.author)
+            for i in range(25)
+        ])
+        Post.objects.bulk_create([
+            Post(text='Чужой текст' + str(i), author=cls.other)
+            for i in range(3)
+        ])
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def follow_page(self, query=''):
+        return self.authorized_client.get(
+            reverse('posts:follow_index') + query
+        )
+
+    def test_timeline_page_skips_follow_join(self):
+        """Страница из ленты читается без JOIN с подписками."""
+        self.follow_page()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.follow_page()
+        self.assertEqual(len(response.context['page_obj']), 10)
+        for query in queries.captured_queries:
+            self.assertNotIn('posts_follow', query['sql'])
+
+    def test_pages_match_database_feed(self):
+        """Лента и запасной путь через базу дают одинаковые страницы."""
+        posts = Post.objects.filter(author__following__user=self.user)
+        expected = KeysetPaginator(posts, 10)
+        response = self.follow_page()
+        page_obj = response.context['page_obj']
+        while True:
+            with self.subTest(number=page_obj.number):
+                self.assertEqual(
+                    list(page_obj), list(expected.page(page_obj.number))
+                )
+            if not page_obj.next_cursor:
+                break
+            page_obj = self.follow_page(
+                '?cursor=' + page_obj.next_cursor
+            ).context['page_obj']
+        self.assertEqual(page_obj.number, 3)
+
+    def test_new_post_is_pushed(self):
+        """Новый пост попадает в ленту подписчика при записи."""
+        self.follow_page()
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        entries = timeline.get_timeline(self.user.pk)['entries']
+        self.assertEqual(entries[0][1], post.pk)
+        self.assertEqual(self.follow_page().context['page_obj'][0], post)
+
+    def test_follow_and_unfollow_update_timeline(self):
+        """Подписка дополняет ленту, отписка чистит её."""
+        self.follow_page()
+        Follow.objects.create(user=self.user, author=self.other)
+        authors = {
+            item[2] for item in timeline.get_timeline(self.user.pk)['entries']
+        }
+        self.assertIn(self.other.pk, authors)
+        Follow.objects.filter(user=self.user, author=self.other).delete()
+        authors = {
+            item[2] for item in timeline.get_timeline(self.user.pk)['entries']
+        }
+        self.assertEqual(authors, {self.author.pk})
+
+    @override_settings(POSTS_TIMELINE_FANOUT_THRESHOLD=0)
+    def test_hybrid_mode_merges_popular_authors_on_read(self):
+        """Посты популярных авторов не рассылаются, а подмешиваются."""
+        self.follow_page()
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        cached = cache.get(timeline.timeline_key(self.user.pk))
+        self.assertNotIn(post.pk, [item[1] for item in cached['entries']])
+        self.assertEqual(self.follow_page().context['page_obj'][0], post)
+
+    def test_author_leaving_celebrities_is_back_in_timeline(self):
+        """Посты автора, который перестал быть популярным, не теряются:
+        лента, собранная без них, собирается заново."""
+        with self.settings(POSTS_TIMELINE_FANOUT_THRESHOLD=0):
+            self.follow_page()
+            post = Post.objects.create(text='Новый пост', author=self.author)
+        cache.delete(timeline.CELEBRITIES_KEY)
+        with self.settings(POSTS_TIMELINE_FANOUT_THRESHOLD=1):
+            self.assertEqual(self.follow_page().context['page_obj'][0], post)
+
+
+class TimelineUpdateTest(SimpleTestCase):
+    """Одновременные правки одной ленты."""
+
+    def setUp(self):
+        cache.clear()
+        self.key = timeline.timeline_key(1)
+        cache.set(self.key, {'entries': [], 'complete': True})
+
+    def slow_push(self, pk):
+        def change(value):
+            time.sleep(0.05)
+            return {
+                'entries': [(0.0, pk, 1)] + value['entries'],
+                'complete': value['complete'],
+            }
+        return lambda: timeline.update([1], change)
+
+    def test_concurrent_pushes_are_not_lost(self):
+        threads = [
+            threading.Thread(target=self.slow_push(pk)) for pk in (1, 2)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertCountEqual(
+            [item[1] for item in cache.get(self.key)['entries']], [1, 2]
+        )
+
+    @override_settings(POSTS_TIMELINE_LOCK_WAIT=0.05)
+    def test_busy_timeline_is_dropped(self):
+        """Ленту, занятую дольше LOCK_WAIT, соберёт build()."""
+        cache.add(timeline.lock_key(self.key), 1)
+        self.assertEqual(self.slow_push(1)(), 0)
+        self.assertIsNone(cache.get(self.key))
+
+
+class TieredTimelineTest(SimpleTestCase):
+    """Правки ленты из двух процессов с собственным L1."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(CACHES={
+            'default': cache_from_url('locmem://default'),
+            'worker_a': cache_from_url('locmem://a'),
+            'worker_b': cache_from_url('locmem://b'),
+            'shared': cache_from_url(f'file://{directory.name}'),
+        })
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.key = timeline.timeline_key(1)
+        self.workers = [
+            TieredCache('', {'OPTIONS': {'L1': alias}})
+            for alias in ('worker_a', 'worker_b')
+        ]
+
+    def push(self, worker, pk):
+        with mock.patch.object(timeline, 'cache', worker):
+            return timeline.update([1], lambda value: {
+                'entries': [(0.0, pk, 1)] + value['entries'],
+                'complete': value['complete'],
+            })
+
+    def test_stale_l1_does_not_lose_push(self):
+        worker_a, worker_b = self.workers
+        worker_a.set(self.key, {'entries': [], 'complete': True})
+        self.assertEqual(self.push(worker_b, 1), 1)
+        self.assertEqual(self.push(worker_a, 2), 1)
+        self.assertEqual(
+            [item[1] for item in caches['shared'].get(self.key)['entries']],
+            [2, 1]
+        )
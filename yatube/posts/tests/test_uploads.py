@@ -0,0 +1,90 @@
+import io
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from posts.models import Post
+
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+ORIENTATION = 0x0112
+
+
+def upload(name, size, mode='RGB', image_format='JPEG', orientation=None):
+    image = Image.new(mode, size, 'red')
+    buffer = io.BytesIO()
+    options = {}
+    if orientation is not None:
+        exif = Image.Exif()
+        exif[ORIENTATION] = orientation
+        options['exif'] = exif.tobytes()
+    image.save(buffer, image_format, **options)
+    return SimpleUploadedFile(
+        name, buffer.getvalue(), f'image/{image_format.lower()}'
+    )
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT, POSTS_THUMBNAILS_ASYNC=True,
+    POSTS_IMAGE_MAX_SIZE=400,
+)
+class UploadNormalizationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='Name')
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create(self, image):
+        return self.authorized_client.post(
+            reverse('posts:post_create'), {'text': 'Пост', 'image': image}
+        )
+
+    def test_photo_is_rotated_capped_and_stripped(self):
+        """Фото поворачивается по EXIF, уменьшается и теряет EXIF."""
+        self.create(upload('photo.jpeg', (800, 600), orientation=6))
+        post = Post.objects.get()
+        self.assertEqual((post.image_width, post.image_height), (300, 400))
+        self.assertTrue(post.image.name.endswith('.jpg'))
+        with Image.open(post.image.path) as stored:
+            self.assertEqual(stored.size, (300, 400))
+            self.assertNotIn(ORIENTATION, stored.getexif())
+
+    def test_transparent_image_stays_png(self):
+        self.create(upload('logo.png', (100, 50), 'RGBA', 'PNG'))
+        post = Post.objects.get()
+        self.assertTrue(post.image.name.endswith('.png'))
+        self.assertEqual((post.image_width, post.image_height), (100, 50))
+
+    @override_settings(POSTS_IMAGE_MAX_PIXELS=100 * 100)
+    def test_too_many_pixels_are_rejected(self):
+        response = self.create(upload('huge.jpeg', (200, 200)))
+        self.assertFormError(
+            response, 'form', 'image',
+            'Картинка слишком большая: 200×200 точек.'
+        )
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(POSTS_IMAGE_MAX_UPLOAD_SIZE=100)
+    def test_too_large_file_is_rejected(self):
+        self.create(upload('photo.jpeg', (200, 200)))
+        self.assertFalse(Post.objects.exists())
+
+    def test_removing_image_clears_dimensions(self):
+        self.create(upload('photo.jpeg', (200, 100)))
+        post = Post.objects.get()
+        post.image = None
+        post.save()
+        post.refresh_from_db()
+        self.assertIsNone(post.image_width)
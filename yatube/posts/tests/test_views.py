@@ -199,12 +199,14 @@ class PostPagesTests(TestCase):
                 self.assertIsInstance(form_field, expected)
 
     def test_cache_index(self):
-        """На странице index список записей кешируется на 20 секунд."""
-        post = get_object_or_404(Post, id=1)
+        """Страница index кешируется, пока не изменились её посты."""
         response_1 = self.client.get(reverse('posts:index'))
-        post.delete()
+        Post.objects.filter(id=1).update(text='Без сигналов')
         response_2 = self.client.get(reverse('posts:index'))
         self.assertEqual(response_1.content, response_2.content)
+        get_object_or_404(Post, id=1).delete()
+        response_3 = self.client.get(reverse('posts:index'))
+        self.assertNotEqual(response_1.content, response_3.content)
 
     def test_posts_page_show_correct_context(self):
         """Новая запись пользователя появляется в ленте тех, кто на него
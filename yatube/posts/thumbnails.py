@@ -0,0 +1,290 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.templatetags.static import static
+from PIL import features
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+from sorl.thumbnail.parsers import parse_geometry
+
+from . import feeds
+
+
+logger = logging.getLogger(__name__)
+
+# Наборы адаптивных вариантов картинки поста: ширины для srcset,
+# отношение высоты к ширине, кадрирование, sizes и ширина для src.
+IMAGE_SETS = {
+    'card': {
+        'widths': (150, 300, 600),
+        'ratio': 1,
+        'crop': 'center',
+        'sizes': '(max-width: 576px) 50vw, 300px',
+        'fallback': 300,
+    },
+}
+# WebP пишется, только если Pillow собран с libwebp.
+FORMATS = ('JPEG', 'WEBP') if features.check('webp') else ('JPEG',)
+PLACEHOLDER = 'img/thumbnail-pending.svg'
+# Сколько секунд помнить, что миниатюры ещё нет.
+EMPTY_TIMEOUT = 60
+
+_executor = None
+
+
+def variant_name(set_name, width, image_format):
+    return f'{set_name}-{width}-{image_format.lower()}'
+
+
+def build_variants():
+    """Варианты sorl-thumbnail: геометрия и параметры по имени варианта.
+
+    Имя набора — синоним его JPEG-варианта ширины fallback.
+    """
+    variants = {}
+    for set_name, spec in IMAGE_SETS.items():
+        for width in spec['widths']:
+            geometry = f'{width}x{round(width * spec["ratio"])}'
+            for image_format in FORMATS:
+                variants[variant_name(set_name, width, image_format)] = (
+                    geometry, {'crop': spec['crop'], 'format': image_format}
+                )
+        variants[set_name] = variants[
+            variant_name(set_name, spec['fallback'], 'JPEG')
+        ]
+    return variants
+
+
+VARIANTS = build_variants()
+
+
+class KVStore(cached_db_kvstore.KVStore):
+    """Хранилище sorl в кеше и базе с пакетным чтением get_many."""
+
+    def get_many(self, image_files):
+        """Найденные файлы по ключам: один get_many к кешу и не больше
+        одного запроса к базе на все промахи."""
+        keys = {add_prefix(image_file.key): image_file.key
+                for image_file in image_files}
+        found = self.cache.get_many(list(keys))
+        missing = [key for key in keys if key not in found]
+        if missing:
+            stored = dict(KVStoreModel.objects.filter(
+                key__in=missing
+            ).values_list('key', 'value'))
+            self.cache.set_many(
+                stored, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT
+            )
+            # Промах — через add и ненадолго: воркер мог сохранить
+            # миниатюру сразу после запроса к базе.
+            for key in missing:
+                if key not in stored:
+                    self.cache.add(
+                        key, cached_db_kvstore.EMPTY_VALUE, EMPTY_TIMEOUT
+                    )
+            found.update(stored)
+        return {
+            keys[key]: deserialize_image_file(value)
+            for key, value in found.items()
+            if value != cached_db_kvstore.EMPTY_VALUE
+        }
+
+
+class PrecomputedBackend(ThumbnailBackend):
+    def thumbnail_file(self, file_, geometry_string, options):
+        """Файл миниатюры, под которым её сохраняет get_thumbnail."""
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def lookup_many(self, requests):
+        """Готовые миниатюры для троек (файл, геометрия, параметры).
+
+        Возвращает список в том же порядке, None — миниатюры ещё нет.
+        Сами миниатюры не создаются.
+        """
+        thumbnails = [
+            self.thumbnail_file(file_, geometry_string, dict(options))
+            for file_, geometry_string, options in requests
+        ]
+        found = default.kvstore.get_many(thumbnails)
+        return [found.get(thumbnail.key) for thumbnail in thumbnails]
+
+
+backend = PrecomputedBackend()
+
+
+class Placeholder:
+    """Заглушка того же размера, пока миниатюра ещё готовится."""
+
+    pending = True
+
+    def __init__(self, geometry_string):
+        self.width, self.height = parse_geometry(geometry_string)
+        self.url = static(PLACEHOLDER)
+
+
+def resolve_many(images, variants):
+    """Миниатюры нескольких вариантов для картинок одним пакетом.
+
+    Ключи — пары (имя картинки, вариант); пока миниатюры нет,
+    вместо неё возвращается заглушка.
+    """
+    pairs = [
+        (image, variant)
+        for image in images if image
+        for variant in variants
+    ]
+    found = backend.lookup_many(
+        [(image, *VARIANTS[variant]) for image, variant in pairs]
+    )
+    return {
+        (image.name, variant): thumbnail or Placeholder(VARIANTS[variant][0])
+        for (image, variant), thumbnail in zip(pairs, found)
+    }
+
+
+def resolve(images, variant):
+    """Миниатюры одного варианта для картинок, по именам картинок."""
+    return {
+        name: thumbnail
+        for (name, _), thumbnail in resolve_many(images, [variant]).items()
+    }
+
+
+def lookup(image, variant):
+    """Миниатюра одной картинки или заглушка; None, если картинки нет."""
+    if not image:
+        return None
+    return resolve([image], variant)[image.name]
+
+
+def set_widths(set_name, image_width=None):
+    """Ширины набора, не больше ширины исходной картинки.
+
+    sorl увеличивает маленькие картинки: такие варианты тяжелее
+    оригинала и только обманывают браузер в srcset.
+    """
+    widths = IMAGE_SETS[set_name]['widths']
+    if image_width is None:
+        return widths
+    return tuple(width for width in widths if width <= image_width)
+
+
+def set_variants(set_name):
+    spec = IMAGE_SETS[set_name]
+    return [set_name] + [
+        variant_name(set_name, width, image_format)
+        for width in spec['widths'] for image_format in FORMATS
+    ]
+
+
+def picture(resolved, name, set_name, image_width=None):
+    """Контекст includes/picture.html для картинки name из набора.
+
+    В srcset попадают только готовые варианты не шире оригинала;
+    JPEG идёт в <img>, остальные форматы — в <source>.
+    """
+    spec = IMAGE_SETS[set_name]
+    srcsets = {}
+    for image_format in FORMATS:
+        ready = [
+            resolved[name, variant_name(set_name, width, image_format)]
+            for width in set_widths(set_name, image_width)
+        ]
+        srcsets[image_format] = ', '.join(
+            f'{thumbnail.url} {thumbnail.width}w'
+            for thumbnail in ready if not getattr(thumbnail, 'pending', False)
+        )
+    return {
+        'image': resolved[name, set_name],
+        'srcset': srcsets.pop('JPEG'),
+        'sources': [
+            {'type': f'image/{image_format.lower()}', 'srcset': srcset}
+            for image_format, srcset in srcsets.items() if srcset
+        ],
+        'sizes': spec['sizes'],
+    }
+
+
+def generate(name, image_width=None):
+    """Создаёт варианты картинки; уже готовые не пересчитываются.
+
+    Варианты шире image_width пропускаются, кроме запасного для <img>.
+    """
+    from .models import Post
+    source = ImageFile(name, Post.image.field.storage)
+    variants = []
+    for set_name in IMAGE_SETS:
+        variants.append(set_name)
+        variants.extend(
+            variant_name(set_name, width, image_format)
+            for width in set_widths(set_name, image_width)
+            for image_format in FORMATS
+        )
+    for variant in variants:
+        geometry, options = VARIANTS[variant]
+        backend.get_thumbnail(source, geometry, **options)
+
+
+def executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            settings.POSTS_THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def render(post_id, name):
+    """Готовит миниатюры поста и сбрасывает кеш страниц с ним."""
+    from .models import Post
+    from .signals import follower_ids, post_feeds
+    try:
+        post = Post.objects.select_related('author', 'group').filter(
+            pk=post_id, image=name
+        ).first()
+        if post is None:
+            return
+        generate(name, post.image_width)
+        feeds.bump(post_feeds(
+            post.author.username, post.group.slug if post.group else None,
+            follower_ids(post.author_id)
+        ) + [feeds.feed_name(feeds.POST, post_id)])
+    except Exception:
+        logger.exception('Не удалось создать миниатюры %s', name)
+
+
+def work(post_id, name):
+    try:
+        render(post_id, name)
+    finally:
+        connection.close()
+
+
+def schedule(post):
+    """Ставит миниатюры картинки поста в очередь после коммита."""
+    if not post.image:
+        return
+    args = (post.pk, post.image.name)
+    if settings.POSTS_THUMBNAILS_ASYNC:
+        transaction.on_commit(lambda: executor().submit(work, *args))
+    else:
+        render(*args)
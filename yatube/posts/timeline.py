@@ -0,0 +1,293 @@
+import time
+from bisect import bisect_left, bisect_right
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Page
+from django.db.models import Count
+
+from core.caches import shared
+
+from .models import Follow, Post
+from .paginator import NEXT, KeysetPaginator, decode_cursor
+
+
+CELEBRITIES_KEY = 'posts:timeline:celebrities'
+
+
+def timeline_key(user_id):
+    return f'posts:timeline:{user_id}'
+
+
+def lock_key(key):
+    return f'{key}:lock'
+
+
+def celebrity_ids():
+    """Авторы, чьи посты не рассылаются, а подмешиваются при чтении.
+
+    Это авторы, у которых подписчиков больше, чем
+    POSTS_TIMELINE_FANOUT_THRESHOLD; без порога рассылка идёт всем.
+    """
+    threshold = settings.POSTS_TIMELINE_FANOUT_THRESHOLD
+    if threshold is None:
+        return frozenset()
+    ids = cache.get(CELEBRITIES_KEY)
+    if ids is None:
+        ids = frozenset(Follow.objects.values('author').annotate(
+            followers=Count('pk')
+        ).filter(followers__gt=threshold).values_list('author', flat=True))
+        cache.set(
+            CELEBRITIES_KEY, ids, settings.POSTS_TIMELINE_CELEBRITIES_TIMEOUT
+        )
+    return ids
+
+
+def entry(pub_date, pk, author_id):
+    """Запись ленты: (время публикации, id поста, id автора)."""
+    return (pub_date.timestamp(), pk, author_id)
+
+
+def post_entry(post):
+    return entry(post.pub_date, post.pk, post.author_id)
+
+
+def trim(entries, complete=True):
+    """Сортирует записи и обрезает ленту до POSTS_TIMELINE_SIZE."""
+    entries.sort(key=lambda item: (item[0], item[1]), reverse=True)
+    size = settings.POSTS_TIMELINE_SIZE
+    return {
+        'entries': entries[:size],
+        'complete': complete and len(entries) <= size,
+    }
+
+
+def recent_entries(posts):
+    posts = posts.order_by('-pub_date', '-pk').values_list(
+        'pub_date', 'pk', 'author_id'
+    )
+    return [
+        entry(*values)
+        for values in posts[:settings.POSTS_TIMELINE_SIZE + 1]
+    ]
+
+
+def merge(*timelines):
+    """Сливает ленты; результат обрезается там, где кончается неполная."""
+    entries = {}
+    for timeline in timelines:
+        entries.update((item[1], item) for item in timeline['entries'])
+    merged = list(entries.values())
+    for timeline in timelines:
+        if timeline['complete']:
+            continue
+        if not timeline['entries']:
+            return {'entries': [], 'complete': False}
+        oldest = timeline['entries'][-1]
+        merged = [
+            item for item in merged
+            if (item[0], item[1]) >= (oldest[0], oldest[1])
+        ]
+    return trim(
+        merged, all(timeline['complete'] for timeline in timelines)
+    )
+
+
+def build(user_id, celebrities):
+    """Собирает ленту подписок из базы — запасной путь при промахе кеша.
+
+    Лента помнит, без чьих постов собрана: celebrities.
+    """
+    timeline = trim(recent_entries(
+        Post.objects.filter(author__following__user_id=user_id).exclude(
+            author_id__in=celebrities
+        )
+    ))
+    timeline['celebrities'] = celebrities
+    return timeline
+
+
+def pull(user_id, celebrities):
+    followed = Follow.objects.filter(
+        user_id=user_id, author_id__in=celebrities
+    ).values('author_id')
+    return trim(recent_entries(Post.objects.filter(author_id__in=followed)))
+
+
+def get_timeline(user_id):
+    """Лента подписок пользователя, новые записи первыми.
+
+    Хранит не больше POSTS_TIMELINE_SIZE записей и всегда является
+    началом полной ленты; complete означает, что других постов нет.
+    Посты авторов из celebrity_ids() подмешиваются при каждом чтении.
+    Лента, собранная при другом наборе таких авторов, собирается
+    заново: посты автора, который перестал быть популярным, в ней
+    не разосланы, а при чтении уже не подмешиваются.
+    """
+    celebrities = celebrity_ids()
+    key = timeline_key(user_id)
+    timeline = cache.get(key)
+    if timeline is None or timeline.get('celebrities') != celebrities:
+        timeline = build(user_id, celebrities)
+        cache.set(key, timeline, settings.POSTS_TIMELINE_TIMEOUT)
+    if celebrities:
+        timeline = merge(timeline, pull(user_id, celebrities))
+    return timeline
+
+
+def update(user_ids, change):
+    """Применяет change к лентам, которые уже лежат в кеше.
+
+    Лента читается и записывается под блокировкой cache.add, иначе
+    из двух одновременных правок одной ленты осталась бы одна.
+    Занятые ленты ждут до POSTS_TIMELINE_LOCK_WAIT секунд, а потом
+    удаляются: при чтении их соберёт build(). Под блокировкой лента
+    читается из общего кеша: копия в L1 процесса могла устареть.
+    Возвращает число изменённых лент.
+    """
+    pending = set(cache.get_many(
+        [timeline_key(user_id) for user_id in user_ids]
+    ))
+    deadline = time.monotonic() + settings.POSTS_TIMELINE_LOCK_WAIT
+    updated = 0
+    while pending:
+        locked = [
+            key for key in pending if cache.add(
+                lock_key(key), 1, settings.POSTS_TIMELINE_LOCK_TIMEOUT
+            )
+        ]
+        try:
+            changed = {
+                key: dict(timeline, **change(timeline))
+                for key, timeline in shared(cache).get_many(locked).items()
+            }
+            cache.set_many(changed, settings.POSTS_TIMELINE_TIMEOUT)
+        finally:
+            cache.delete_many([lock_key(key) for key in locked])
+        updated += len(changed)
+        pending.difference_update(locked)
+        if pending and time.monotonic() >= deadline:
+            cache.delete_many(pending)
+            break
+        if pending:
+            time.sleep(0.01)
+    return updated
+
+
+def push(post, user_ids):
+    """Добавляет новый пост в ленты подписчиков автора."""
+    new_entry = post_entry(post)
+    return update(user_ids, lambda timeline: trim(
+        [new_entry] + timeline['entries'], timeline['complete']
+    ))
+
+
+def remove(post, user_ids):
+    return update(user_ids, lambda timeline: {
+        'entries': [
+            item for item in timeline['entries'] if item[1] != post.pk
+        ],
+        'complete': timeline['complete'],
+    })
+
+
+def distribute(post, user_ids):
+    """Рассылает пост подписчикам, если автор не из celebrity_ids().
+
+    Возвращает число лент, которые пришлось перезаписать.
+    """
+    if post.author_id in celebrity_ids():
+        return 0
+    return push(post, user_ids)
+
+
+def retract(post, user_ids):
+    if post.author_id in celebrity_ids():
+        return 0
+    return remove(post, user_ids)
+
+
+def backfill(user_id, author_id):
+    """Вливает последние посты нового автора в ленту подписчика."""
+    if author_id in celebrity_ids():
+        return
+    recent = recent_entries(Post.objects.filter(author_id=author_id))
+    complete = len(recent) <= settings.POSTS_TIMELINE_SIZE
+
+    def change(timeline):
+        entries = timeline['entries']
+        if timeline['complete']:
+            return trim(entries + recent, complete)
+        oldest = (entries[-1][0], entries[-1][1])
+        return trim(entries + [
+            item for item in recent if (item[0], item[1]) > oldest
+        ], False)
+    update([user_id], change)
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты посты автора, от которого отписались."""
+    update([user_id], lambda timeline: {
+        'entries': [
+            item for item in timeline['entries'] if item[2] != author_id
+        ],
+        'complete': timeline['complete'],
+    })
+
+
+class TimelinePaginator(KeysetPaginator):
+    """Пагинатор ленты подписок поверх материализованной ленты.
+
+    Страницы, целиком лежащие в ленте, собираются по id постов
+    без JOIN с подписками; остальные читаются из базы по курсору.
+    """
+
+    def __init__(self, object_list, per_page, timeline, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.entries = timeline['entries']
+        self.complete = timeline['complete']
+        self.positions = [(-item[0], -item[1]) for item in self.entries]
+
+    def covers(self, top):
+        return top <= len(self.entries) or self.complete
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        page = None
+        if self.covers(top):
+            page = self._timeline_page(bottom, top, number)
+        if page is None:
+            return super().page(number)
+        return page
+
+    def cursor_page(self, token):
+        pub_date, pk, number, direction = decode_cursor(token)
+        position = (-pub_date.timestamp(), -pk)
+        page = None
+        if direction == NEXT:
+            bottom = bisect_right(self.positions, position)
+            top = bottom + self.per_page
+            if self.covers(top):
+                page = self._timeline_page(bottom, top, number)
+        else:
+            top = bisect_left(self.positions, position)
+            bottom = max(top - self.per_page, 0)
+            if self.covers(top + 1):
+                page = self._timeline_page(bottom, top, number)
+        if page is None:
+            return super().cursor_page(token)
+        return page
+
+    def _timeline_page(self, bottom, top, number):
+        ids = [item[1] for item in self.entries[bottom:top]]
+        if not ids:
+            if self.complete and number == 1:
+                return self._with_cursors(Page([], number, self))
+            return None
+        posts = Post.objects.for_feed().in_bulk(ids)
+        object_list = [posts[pk] for pk in ids if pk in posts]
+        if len(object_list) < len(ids):
+            return None
+        return self._with_cursors(Page(object_list, number, self))
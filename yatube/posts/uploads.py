@@ -0,0 +1,46 @@
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from PIL import Image, ImageOps
+
+
+def has_alpha(image):
+    return image.mode in ('RGBA', 'LA') or (
+        image.mode == 'P' and 'transparency' in image.info
+    )
+
+
+def normalize_image(file_):
+    """Готовит загруженную картинку к хранению.
+
+    Поворачивает по EXIF-ориентации и отбрасывает сами метаданные,
+    уменьшает до POSTS_IMAGE_MAX_SIZE по большей стороне и пережимает
+    в JPEG с качеством POSTS_IMAGE_QUALITY (в PNG, если есть
+    прозрачность). Результат пишется во временный файл, который
+    уходит на диск, если больше FILE_UPLOAD_MAX_MEMORY_SIZE.
+    Возвращает (файл, ширина, высота).
+    """
+    max_size = settings.POSTS_IMAGE_MAX_SIZE
+    file_.seek(0)
+    image = Image.open(file_)
+    # JPEG декодируется сразу в уменьшенном масштабе.
+    image.draft('RGB', (max_size, max_size))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_size, max_size), Image.LANCZOS)
+    output = tempfile.SpooledTemporaryFile(
+        max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+    )
+    if has_alpha(image):
+        image.convert('RGBA').save(output, 'PNG', optimize=True)
+        extension = '.png'
+    else:
+        image.convert('RGB').save(
+            output, 'JPEG', quality=settings.POSTS_IMAGE_QUALITY,
+            optimize=True, progressive=True,
+        )
+        extension = '.jpg'
+    output.seek(0)
+    name = os.path.splitext(os.path.basename(file_.name))[0] + extension
+    return File(output, name=name), image.width, image.height
@@ -1,22 +1,43 @@
-from django.core.paginator import Paginator
+from urllib.parse import urlencode
+
 from django.shortcuts import get_object_or_404, render
 from .models import Post, Group, User, Follow
 from .forms import PostForm, CommentForm
 from django.shortcuts import redirect
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.cache import cache_page
+from django.conf import settings
+from core.routers import use_replica
+from . import counters, feeds, search, timeline
+from .conditional import feed_condition, post_condition
+from .paginator import KeysetPaginator
+from .timeline import TimelinePaginator
 
 
 posts_per_page: int = 10
 
 
-@cache_page(20)
+def get_page_obj(request, posts, count_key, page_key):
+    paginator = KeysetPaginator(
+        posts, posts_per_page, count_key=count_key, page_key=page_key
+    )
+    return get_paginated(request, paginator)
+
+
+def get_paginated(request, paginator):
+    return paginator.get_page(
+        request.GET.get('page'), cursor=request.GET.get('cursor')
+    )
+
+
+@feeds.cache_feed(settings.POSTS_FEED_TIMEOUT, feeds.ALL)
+@use_replica
 def index(request):
     template = 'posts/index.html'
-    posts = Post.objects.select_related('author')
-    paginator = Paginator(posts, posts_per_page)
-    page_mumber = request.GET.get('page')
-    page_obj = paginator.get_page(page_mumber)
+    posts = Post.objects.for_feed()
+    page_obj = get_page_obj(
+        request, posts,
+        counters.count_key(feeds.ALL), feeds.page_key(feeds.ALL)
+    )
     context = {
         'posts': posts,
         'page_obj': page_obj,
@@ -24,13 +45,18 @@ def index(request):
     return render(request, template, context)
 
 
+@feed_condition(feeds.GROUP, 'slug')
+@feeds.cache_feed(settings.POSTS_FEED_TIMEOUT, feeds.GROUP, 'slug')
+@use_replica
 def group_posts(request, slug):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    posts = group.post.select_related('group')
-    paginator = Paginator(posts, posts_per_page)
-    page_mumber = request.GET.get('page')
-    page_obj = paginator.get_page(page_mumber)
+    posts = group.post.for_feed()
+    page_obj = get_page_obj(
+        request, posts,
+        counters.count_key(feeds.GROUP, group.pk),
+        feeds.page_key(feeds.GROUP, slug)
+    )
     context = {
         'group': group,
         'posts': posts,
@@ -39,13 +65,18 @@ def group_posts(request, slug):
     return render(request, template, context, slug)
 
 
+@feed_condition(feeds.AUTHOR, 'username')
+@feeds.cache_feed(settings.POSTS_FEED_TIMEOUT, feeds.AUTHOR, 'username')
+@use_replica
 def profile(request, username):
     template = 'posts/profile.html'
     author = get_object_or_404(User, username=username)
-    posts = author.name.select_related('author')
-    paginator = Paginator(posts, posts_per_page)
-    page_mumber = request.GET.get('page')
-    page_obj = paginator.get_page(page_mumber)
+    posts = author.name.for_feed()
+    page_obj = get_page_obj(
+        request, posts,
+        counters.count_key(feeds.AUTHOR, author.pk),
+        feeds.page_key(feeds.AUTHOR, username)
+    )
     if request.user.is_authenticated:
         following = Follow.objects.filter(
             user=request.user, author=author
@@ -61,12 +92,16 @@ def profile(request, username):
     return render(request, template, context)
 
 
+@post_condition
+@use_replica
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    posts = get_object_or_404(Post, id=post_id)
-    post_cnt = Post.objects.filter(
-        author=posts.author).count()
-    comments = posts.comments.select_related('post')
+    posts = get_object_or_404(
+        Post.objects.for_feed().select_related('author__post_counter'),
+        id=post_id
+    )
+    post_cnt = counters.author_posts_count(posts.author)
+    comments = posts.comments.for_thread()
     form = CommentForm(request.POST or None)
     context = {
         'posts': posts,
@@ -81,7 +116,7 @@ def post_detail(request, post_id):
 @login_required()
 def post_create(request):
     template = 'posts/post_create.html'
-    form = PostForm(request.POST)
+    form = PostForm(request.POST, files=request.FILES or None)
     context = {
         'form': form
     }
@@ -136,13 +171,44 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@use_replica
+def search_posts(request):
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    page_obj = search.search_page(
+        query, request.GET.get('page'), posts_per_page
+    )
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'page_params': urlencode({'q': query}) + '&',
+    }
+    return render(request, template, context)
+
+
+def get_follow_page(request, posts):
+    count_key = counters.count_key(feeds.FOLLOW, request.user.pk)
+    if settings.POSTS_TIMELINE_ENABLED:
+        paginator = TimelinePaginator(
+            posts, posts_per_page, timeline.get_timeline(request.user.pk),
+            count_key=count_key
+        )
+        return get_paginated(request, paginator)
+    return get_page_obj(
+        request, posts, count_key,
+        feeds.page_key(feeds.FOLLOW, request.user.pk)
+    )
+
+
 @login_required
+@use_replica
 def follow_index(request):
     template = 'posts/follow.html'
-    posts = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(posts, posts_per_page)
-    page_mumber = request.GET.get('page')
-    page_obj = paginator.get_page(page_mumber)
+    posts = Post.objects.for_feed().filter(
+        author__following__user=request.user
+    )
+    with feeds.read_settled(feeds.FOLLOW, request.user.pk):
+        page_obj = get_follow_page(request, posts)
     context = {
         'posts': posts,
         'page_obj': page_obj
@@ -166,6 +232,6 @@ def profile_follow(request, username):
 @login_required
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    follow = get_object_or_404(Follow, author=author)
+    follow = get_object_or_404(Follow, user=request.user, author=author)
     follow.delete()
     return redirect('posts:profile', username)
@@ -12,6 +12,9 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 
 import os
 
+from core.caches import caches_from_env
+from core.databases import databases_from_env
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -54,6 +57,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'core.middleware.PrimaryStickinessMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -92,12 +96,11 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
-}
+DATABASES = databases_from_env(os.environ, BASE_DIR)
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+REPLICA_STICKY_TIMEOUT = 10
 
 
 # Password validation
@@ -140,6 +143,13 @@ STATIC_URL = '/static/'
 
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
+# collectstatic кладёт сюда файлы с хешем в имени и их .gz/.br,
+# а yatube.wsgi отдаёт их через core.fileserver.FileServer.
+STATIC_ROOT = os.environ.get(
+    'STATIC_ROOT', os.path.join(BASE_DIR, 'staticfiles')
+)
+STATICFILES_STORAGE = 'core.staticfiles.CompressedManifestStaticFilesStorage'
+
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 
@@ -151,8 +161,30 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
-}
+CACHES = caches_from_env(os.environ)
+
+POSTS_COUNT_TIMEOUT = 60 * 60
+
+POSTS_TIMELINE_ENABLED = False
+POSTS_TIMELINE_SIZE = 500
+POSTS_TIMELINE_TIMEOUT = 60 * 60 * 24
+POSTS_TIMELINE_FANOUT_THRESHOLD = None
+POSTS_TIMELINE_CELEBRITIES_TIMEOUT = 60 * 10
+POSTS_TIMELINE_LOCK_TIMEOUT = 10
+POSTS_TIMELINE_LOCK_WAIT = 2
+POSTS_PAGE_TIMEOUT = 60 * 60
+POSTS_FEED_TIMEOUT = 60 * 60
+POSTS_FEED_STALE_TIMEOUT = 60
+POSTS_FEED_EARLY_BETA = 1.0
+POSTS_FEED_LOCK_TIMEOUT = 10
+POSTS_FEED_LOCK_WAIT = 2
+POSTS_THUMBNAILS_ASYNC = not DEBUG
+POSTS_THUMBNAIL_WORKERS = 4
+POSTS_IMAGE_MAX_SIZE = 2048
+POSTS_IMAGE_QUALITY = 85
+POSTS_IMAGE_MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+POSTS_IMAGE_MAX_PIXELS = 40 * 1000 * 1000
+# Сколько лучших результатов поиска ранжируется и пагинируется.
+POSTS_SEARCH_MAX_RESULTS = 1000
+
+THUMBNAIL_KVSTORE = 'posts.thumbnails.KVStore'